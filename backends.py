@@ -0,0 +1,159 @@
+import csv
+import itertools
+import os
+
+from contextlib import contextmanager
+
+import numpy as np
+
+from excel_filter import Constant, RoiSheet
+
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# READERS AND WRITERS FOR THE NON EXCEL FORMATS. A READER RETURNS THE SOURCE RoiSheet (FIRST COLUMN KEPT AS IS,
+# OTHER COLUMNS AS FLOATS), A WRITER PRODUCES ONE FILE PER RESULT SHEET IN THE OUTPUT DIRECTORY.
+# PARQUET AND ARROW NEED PYARROW, CSV USES IT WHEN INSTALLED AND THE csv MODULE OTHERWISE.
+
+def require_pyarrow(what):
+    if pyarrow is None:
+        raise ImportError('{} support needs pyarrow, install it with: pip install pyarrow'.format(what))
+
+
+def read_sheet(file):
+    title, extension = os.path.splitext(os.path.basename(file))
+    extension = extension.lower()
+    if extension == Constant.CSV:
+        return read_csv(file, title)
+    if extension == Constant.PARQUET:
+        require_pyarrow('Parquet')
+        return sheet_from_table(title, pyarrow.parquet.read_table(file))
+    if extension in (Constant.ARROW, Constant.FEATHER):
+        require_pyarrow('Arrow')
+        return sheet_from_table(title, pyarrow.feather.read_table(file))
+    raise TypeError('No reader for: {}'.format(file))
+
+
+def read_csv(file, title):
+    if pyarrow is not None:
+        return sheet_from_table(title, pyarrow.csv.read_csv(file))
+    # ONE PASS OVER THE ROWS OF THE CHUNKED MODE READER, EMPTY CELLS ARE NaN AS WITH PYARROW
+    with open_rows(file) as (_, rows):
+        return RoiSheet.from_rows(title, rows)
+
+
+def parse_number(value):
+    for number_type in (int, float):
+        try:
+            return number_type(value)
+        except ValueError:
+            pass
+    return value
+
+
+def sheet_from_table(title, table):
+    names = table.column_names
+    values = np.empty((table.num_rows, max(table.num_columns - 1, 0)))
+    for column in range(1, table.num_columns):
+        # NULLS BECOME NaN, AS EMPTY CELLS OF AN EXCEL SHEET
+        values[:, column - 1] = table.column(column).cast(pyarrow.float64()).to_numpy()
+    return RoiSheet(title, names[0] or None, table.column(0).to_pylist(), [name or None for name in names[1:]],
+                    values)
+
+
+def write_sheets(directory, sheets, output_format):
+    os.makedirs(directory, exist_ok=True)
+    for sheet in sheets:
+        path = os.path.join(directory, sheet.title.replace(os.sep, '_') + '.' + output_format)
+        if output_format == Constant.CSV_FORMAT:
+            with open(path, 'w', newline='') as fp:
+                csv.writer(fp).writerows(sheet.iter_rows())
+        elif output_format == Constant.PARQUET_FORMAT:
+            require_pyarrow('Parquet')
+            pyarrow.parquet.write_table(table_from_sheet(sheet), path)
+        elif output_format == Constant.ARROW_FORMAT:
+            require_pyarrow('Arrow')
+            pyarrow.feather.write_feather(table_from_sheet(sheet), path)
+        else:
+            raise ValueError('Unknown output format: {}'.format(output_format))
+
+
+def table_from_sheet(sheet):
+    if isinstance(sheet, RoiSheet):
+        names = [sheet.index_title] + sheet.titles
+        columns = [pyarrow.array(sheet.index)]
+        columns += [pyarrow.array(sheet.values[:, column], from_pandas=True) for column in range(len(sheet.titles))]
+    else:
+        names = ['ROI', 'value']
+        pairs = list(sheet.iter_rows())
+        columns = [pyarrow.array([pair[0] for pair in pairs]), pyarrow.array([pair[1] for pair in pairs])]
+    return pyarrow.Table.from_arrays(columns, names=unique_names(names))
+
+
+def unique_names(names):
+    # ARROW AND PARQUET NEED A STRING NAME PER COLUMN, EMPTY AND REPEATED ROI TITLES ARE NUMBERED
+    seen = {}
+    unique = []
+    for position, name in enumerate(names):
+        name = str(name) if name is not None else 'column {}'.format(position + 1)
+        if name in seen:
+            seen[name] += 1
+            name = '{}.{}'.format(name, seen[name])
+        else:
+            seen[name] = 0
+        unique.append(name)
+    return unique
+
+
+@contextmanager
+def open_rows(file):
+    # ROWS OF A CSV FILE READ LAZILY, FOR THE CHUNKED MODE. PARQUET AND ARROW ARE READ AS A WHOLE TABLE
+    title, extension = os.path.splitext(os.path.basename(file))
+    if extension.lower() != Constant.CSV:
+        raise TypeError('Chunked processing reads excel or csv files: {}'.format(file))
+    with open(file, newline='') as fp:
+        reader = csv.reader(fp)
+        header = [name or None for name in next(reader, [])]
+        yield title, itertools.chain([header], ([parse_number(value) if value else None for value in row]
+                                                for row in reader))
+
+
+class CsvSheetWriter:
+    # ONE CSV FILE OF THE OUTPUT DIRECTORY, APPENDED ROW BY ROW AS A WRITE-ONLY WORKSHEET
+
+    def __init__(self, directory, title, mode='w'):
+        os.makedirs(directory, exist_ok=True)
+        self.file = open(os.path.join(directory, title.replace(os.sep, '_') + Constant.CSV), mode, newline='')
+        self.writer = csv.writer(self.file)
+
+    def append(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class CsvSheetWriters(dict):
+    # CsvSheetWriter BY SHEET TITLE, OPENED ON FIRST USE AND ALL CLOSED ON EXIT
+
+    def __init__(self, directory, mode='w'):
+        super().__init__()
+        self.directory = directory
+        self.mode = mode
+
+    def __missing__(self, title):
+        writer = self[title] = CsvSheetWriter(self.directory, title, self.mode)
+        return writer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for writer in self.values():
+            writer.close()
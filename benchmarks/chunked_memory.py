@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+
+# Peak memory of a whole ExcelFilter.main run, streaming mode (whole arrays in memory) vs chunked mode (two passes,
+# chunk_rows rows at a time), for growing row counts. The chunked peak should stay flat.
+# usage: python3 benchmarks/chunked_memory.py [columns] [chunk_rows] [rows ...]
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import generate_workbook
+
+
+def measure(path, chunk_rows):
+    from excel_filter import ExcelFilter
+    excel_filter = ExcelFilter(streaming=True, chunk_rows=chunk_rows or None)
+    excel_filter.percentage_threshold = 10
+    excel_filter.first_range = [2, 10]
+    excel_filter.second_range = [20, 30]
+    excel_filter.excel_output_file = path + '.out.xlsx'
+    excel_filter.prepare_output_files = lambda file: None
+    excel_filter.main(path)
+    # ru_maxrss IS IN KILOBYTES ON LINUX
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024)
+
+
+def run(columns, chunk_rows, row_counts):
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in row_counts:
+            path = os.path.join(directory, 'recording.xlsx')
+            generate_workbook(path, rows, columns)
+            peaks = []
+            for chunks in (0, chunk_rows):
+                output = subprocess.run([sys.executable, __file__, '--measure', path, str(chunks)],
+                                        check=True, capture_output=True, text=True).stdout
+                peaks.append(output.split()[-1])
+            print('{:>7} rows x {} columns: streaming {:>5} MB, chunked ({} rows) {:>5} MB'.format(
+                rows, columns, peaks[0], chunk_rows, peaks[1]))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--measure':
+        measure(sys.argv[2], int(sys.argv[3]))
+    else:
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 50, int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+            [int(rows) for rows in sys.argv[3:]] or [2000, 8000, 32000])
@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+
+# Cold start budget of the headless entry point. Fails (exit code 1) when a budget is exceeded or when
+# Kivy gets imported by the command line path.
+# usage: python3 benchmarks/cold_start.py
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+
+# SECONDS, BEST OF RUNS
+BUDGETS = {
+    'cli --help': 0.25,
+    'import core': 1.0,
+}
+
+COMMANDS = {
+    'cli --help': [sys.executable, os.path.join(ROOT, 'cli.py'), '--help'],
+    'import core': [sys.executable, '-c', "import sys; import cli, excel_filter; sys.exit('kivy' in sys.modules)"],
+}
+
+
+def best_time(command):
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, cwd=ROOT, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run():
+    over_budget = False
+    for name, command in COMMANDS.items():
+        seconds = best_time(command)
+        status = 'ok' if seconds <= BUDGETS[name] else 'OVER BUDGET'
+        over_budget = over_budget or seconds > BUDGETS[name]
+        print('{:<12} {:.3f} s (budget {:.2f} s) {}'.format(name, seconds, BUDGETS[name], status))
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(run())
@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+
+# Peak memory of ExcelFilter.open_excel_file, full load vs streaming (read_only) load.
+# usage: python3 benchmarks/open_memory.py [rows] [columns]
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import generate_workbook
+
+
+def measure(path, streaming):
+    from excel_filter import ExcelFilter
+    ExcelFilter(streaming=streaming).open_excel_file(path)
+    # ru_maxrss IS IN KILOBYTES ON LINUX
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024)
+
+
+def run(rows, columns):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'recording.xlsx')
+        generate_workbook(path, rows, columns)
+        print('{} rows x {} columns, {:.1f} MB on disk'.format(rows, columns, os.path.getsize(path) / 2 ** 20))
+        for streaming in (False, True):
+            output = subprocess.run([sys.executable, __file__, '--measure', path, str(streaming)],
+                                    check=True, capture_output=True, text=True).stdout
+            print('{:<10} peak RSS: {} MB'.format('streaming' if streaming else 'full', output.split()[-1]))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--measure':
+        measure(sys.argv[2], sys.argv[3] == 'True')
+    else:
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000, int(sys.argv[2]) if len(sys.argv) > 2 else 200)
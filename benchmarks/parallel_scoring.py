@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+
+# Time of the filter and normalize stages of one wide sheet for 1 to N score workers (shared memory column scoring),
+# including the pool start and the copy into shared memory. The results of every run are checked against 1 worker.
+# usage: python3 benchmarks/parallel_scoring.py [rows] [columns] [max_workers]
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_filter import ExcelFilter, RoiSheet
+
+
+def wide_sheet(rows, columns, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(1000.0, 50.0, (rows, columns))
+    # A FIFTH OF THE COLUMNS DRIFT AFTER ROW 15, SO BOTH GOOD AND WRONG SHEETS ARE WRITTEN
+    values[15:, ::5] *= 1.5
+    return RoiSheet('Data', 'Time', list(range(rows)), ['ROI{}'.format(i) for i in range(columns)], values)
+
+
+def run(sheet, workers):
+    excel_filter = ExcelFilter(score_workers=workers)
+    excel_filter.percentage_threshold = 10
+    excel_filter.first_range = [2, 10]
+    excel_filter.second_range = [20, 30]
+    excel_filter.skip_background = True
+    excel_filter.source = sheet
+    start = time.perf_counter()
+    try:
+        excel_filter.filter_columns()
+        excel_filter.calculate_mean_and_normalize_roi()
+    finally:
+        excel_filter.close_column_scorer()
+    return time.perf_counter() - start, excel_filter
+
+
+def same_results(first, second):
+    fields = ('column', 'first_mean', 'second_mean', 'difference', 'good', 'column_mean')
+    return all(np.array_equal(getattr(first.results, field), getattr(second.results, field), equal_nan=True)
+               for field in fields) and \
+        all(np.array_equal(sheet.values, second.sheets[title].values, equal_nan=True)
+            for title, sheet in first.sheets.items() if isinstance(sheet, RoiSheet))
+
+
+def main(rows, columns, max_workers):
+    sheet = wide_sheet(rows, columns)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    print('{} rows x {} columns, {} MB, {} core(s) available'.format(rows, columns, sheet.values.nbytes // 2 ** 20,
+                                                                    cores))
+    if max_workers > cores:
+        # MORE WORKERS THAN CORES ONLY MEASURES THE OVERHEAD OF THE POOL AND OF THE SHARED MEMORY COPY
+        print('warning: more workers than cores, the speedup above {} worker(s) is not meaningful'.format(cores))
+    serial_seconds, serial = run(sheet, 1)
+    print('workers  seconds  speedup  identical')
+    print('{:>7}  {:>7.3f}  {:>7.2f}  {}'.format(1, serial_seconds, 1.0, True))
+    for workers in range(2, max_workers + 1):
+        seconds, parallel = run(sheet, workers)
+        print('{:>7}  {:>7.3f}  {:>7.2f}  {}'.format(workers, seconds, serial_seconds / seconds,
+                                                     same_results(serial, parallel)))
+
+
+if __name__ == '__main__':
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(*(arguments + [2000, 20000, os.cpu_count() or 1][len(arguments):]))
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+
+# Times every ExcelFilter stage on a synthetic workbook and records peak memory, results are written as JSON so that
+# runs can be compared. Each stage is timed without tracing, then run again under tracemalloc for its peak allocation.
+# usage: python3 benchmarks/run_benchmarks.py --rows 5000 --columns 500 --output results.json
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import openpyxl
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_filter import ExcelFilter
+from synthetic import generate_workbook
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark ExcelFilter stages on a synthetic workbook.')
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--columns', type=int, default=200)
+    parser.add_argument('--wrong-fraction', type=float, default=0.2)
+    parser.add_argument('--threshold', type=int, default=10)
+    parser.add_argument('--first-range', type=int, nargs=2, default=[2, 10])
+    parser.add_argument('--second-range', type=int, nargs=2, default=[20, 30])
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs, the best one is kept per stage')
+    parser.add_argument('--streaming', action='store_true')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--output', help='JSON file, printed to stdout when not given')
+    return parser.parse_args(argv)
+
+
+def pipeline(arguments, excel_file):
+    excel_filter = ExcelFilter(streaming=arguments.streaming)
+    excel_filter.percentage_threshold = arguments.threshold
+    excel_filter.first_range = arguments.first_range
+    excel_filter.second_range = arguments.second_range
+    excel_filter.prepare_output_files(excel_file)
+    return [
+        ('open_excel_file', lambda: excel_filter.open_excel_file(excel_file)),
+        ('subtract_background', excel_filter.subtract_background),
+        ('filter_columns', excel_filter.filter_columns),
+        ('calculate_mean_and_normalize_roi', excel_filter.calculate_mean_and_normalize_roi),
+        ('save', lambda: excel_filter.save_excel_file(excel_file)),
+    ]
+
+
+def time_stages(arguments, excel_file):
+    seconds = {}
+    for _ in range(arguments.repeat):
+        for stage, run in pipeline(arguments, excel_file):
+            start_wall = time.perf_counter()
+            start_cpu = time.process_time()
+            run()
+            wall = time.perf_counter() - start_wall
+            cpu = time.process_time() - start_cpu
+            if stage not in seconds or wall < seconds[stage]['wall_seconds']:
+                seconds[stage] = {'wall_seconds': wall, 'cpu_seconds': cpu}
+    return seconds
+
+
+def trace_stages(arguments, excel_file):
+    peaks = {}
+    tracemalloc.start()
+    try:
+        for stage, run in pipeline(arguments, excel_file):
+            tracemalloc.reset_peak()
+            run()
+            peaks[stage] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def run(arguments):
+    with tempfile.TemporaryDirectory() as directory:
+        excel_file = os.path.join(directory, 'synthetic.xlsx')
+        generate_workbook(excel_file, arguments.rows, arguments.columns, arguments.wrong_fraction)
+        input_bytes = os.path.getsize(excel_file)
+        stages = time_stages(arguments, excel_file)
+        if not arguments.no_memory:
+            for stage, peak in trace_stages(arguments, excel_file).items():
+                stages[stage]['peak_bytes'] = peak
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'parameters': vars(arguments),
+        'input_bytes': input_bytes,
+        'versions': {'python': platform.python_version(), 'numpy': np.__version__,
+                     'openpyxl': openpyxl.__version__},
+        'stages': [dict(stage=stage, **result) for stage, result in stages.items()],
+        'total_wall_seconds': sum(result['wall_seconds'] for result in stages.values()),
+        # ru_maxrss IS IN KILOBYTES ON LINUX
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    report = json.dumps(run(arguments), indent=2)
+    if arguments.output is None:
+        print(report)
+    else:
+        with open(arguments.output, 'w') as fp:
+            fp.write(report + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+
+# Building the good ROI sheet: old openpyxl delete_cols loop vs RoiSheet.select_columns gather,
+# for a growing number of rejected columns.
+# usage: python3 benchmarks/select_columns.py [rows] [columns]
+
+import os
+import sys
+import time
+
+import numpy as np
+import openpyxl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_filter import Constant, RoiSheet
+
+
+def delete_columns(sheet, columns_list):
+    # PREVIOUS IMPLEMENTATION, EVERY CALL SHIFTS ALL CELLS ON THE RIGHT OF THE DELETED COLUMN
+    index = 0
+    for column in columns_list:
+        sheet.delete_cols(column - index)
+        index = index + 1
+
+
+def run(rows, columns):
+    values = np.random.rand(rows, columns) * 100
+    titles = ['ROI{}'.format(i) for i in range(1, columns + 1)]
+    source = RoiSheet('Data', 'Time', list(range(1, rows + 1)), titles, values)
+    print('{} rows x {} columns'.format(rows, columns))
+    print('{:>8} {:>14} {:>14}'.format('wrong', 'delete_cols s', 'gather s'))
+    for wrong_count in (10, columns // 10, columns // 4, columns // 2):
+        wrong = np.zeros(columns, dtype=bool)
+        wrong[np.random.choice(columns, wrong_count, replace=False)] = True
+
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        for row in source.iter_rows():
+            sheet.append(row)
+        start = time.perf_counter()
+        delete_columns(sheet, [int(i) + Constant.DATA_MIN_COL for i in np.flatnonzero(wrong)])
+        delete_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        source.select_columns(~wrong, 'good ROI')
+        gather_seconds = time.perf_counter() - start
+        print('{:>8} {:>14.4f} {:>14.4f}'.format(wrong_count, delete_seconds, gather_seconds))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200, int(sys.argv[2]) if len(sys.argv) > 2 else 400)
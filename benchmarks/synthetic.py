@@ -0,0 +1,44 @@
+#!/usr/bin/python3
+
+# Synthetic ROI workbook in the layout ExcelFilter expects: a title row, a time column, the background column at
+# Constant.BACKGROUND_COLUMN_INDEX and the ROI columns after it. Wrong ROI get a step change after change_row so
+# that their two range means differ by far more than any usual threshold.
+# usage: python3 benchmarks/synthetic.py output.xlsx [rows] [columns] [wrong_fraction]
+
+import os
+import random
+import sys
+
+import openpyxl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_filter import Constant
+
+
+def generate_workbook(path, rows, columns, wrong_fraction=0.2, change_row=15, seed=0):
+    generator = random.Random(seed)
+    wrong_columns = set(generator.sample(range(columns), int(round(columns * wrong_fraction))))
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Data')
+    header = ['Time'] + ['ROI{}'.format(i) for i in range(1, columns + 1)]
+    header.insert(Constant.BACKGROUND_COLUMN_INDEX - 1, 'Background')
+    sheet.append(header)
+    for row in range(Constant.DATA_MIN_ROW, rows + Constant.DATA_MIN_ROW):
+        background = 100 + generator.random() * 5
+        values = []
+        for column in range(columns):
+            value = background + 500 + 10 * column + generator.random() * 5
+            if column in wrong_columns and row >= change_row:
+                value *= 1.5
+            values.append(value)
+        values.insert(Constant.BACKGROUND_COLUMN_INDEX - Constant.DATA_MIN_COL, background)
+        sheet.append([row - 1] + values)
+    workbook.save(path)
+    return sorted(wrong_columns)
+
+
+if __name__ == '__main__':
+    generate_workbook(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+                      int(sys.argv[3]) if len(sys.argv) > 3 else 100,
+                      float(sys.argv[4]) if len(sys.argv) > 4 else 0.2)
@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+
+import argparse
+import logging
+import sys
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Filter ROI columns of an excel file, or of every excel file listed '
+                                                 'in a .txt file, without starting the GUI.')
+    parser.add_argument('file', help='excel, csv, parquet or arrow file, or .txt file with one file path per line '
+                                     '(directory with --watch)')
+    parser.add_argument('-t', '--threshold', help='percentage threshold, between 0 and 100 (required without --sweep)')
+    parser.add_argument('--first-range', nargs=2, required=True, metavar=('FROM', 'TO'),
+                        help='first range of rows, TO excluded')
+    parser.add_argument('--second-range', nargs=2, required=True, metavar=('FROM', 'TO'),
+                        help='second range of rows, TO excluded')
+    # SAME DEFAULT AS Constant.MEAN_MIN_ROW / MEAN_MAX_ROW, NOT IMPORTED TO KEEP --help FAST
+    parser.add_argument('--mean-range', nargs=2, metavar=('FROM', 'TO'), default=['22', '41'],
+                        help='rows used for the normalization mean, TO included (default: 22 41)')
+    # SAME CHOICES AS Constant.STATISTICS
+    parser.add_argument('--statistic', choices=['mean', 'median', 'std', 'trimmed_mean'], default='mean',
+                        help='statistic of each range compared against the threshold (default: mean); median and '
+                             'trimmed_mean (10%% cut at each end) are robust to a few noisy frames')
+    parser.add_argument('--skip-background', action='store_true', help='skip background subtraction')
+    parser.add_argument('--skip-normalization', action='store_true', help='skip normalization')
+    parser.add_argument('--streaming', action='store_true',
+                        help='read-only input and write-only output, for large files (input styles are lost)')
+    # SAME CHOICES AS Constant.OUTPUT_FORMATS
+    parser.add_argument('--output-format', choices=['xlsx', 'csv', 'parquet', 'arrow'], default='xlsx',
+                        help='xlsx workbook, or a directory with one csv/parquet/arrow file per result sheet (parquet '
+                             'and arrow need pyarrow)')
+    parser.add_argument('--chunk-rows', type=int, metavar='ROWS',
+                        help='out-of-core mode for files larger than memory: read the input twice, ROWS rows at a '
+                             'time (excel or csv input, xlsx or csv output, no cache)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='keep a state file next to each input and, when rows were appended to it since the last '
+                             'run with the same parameters, only process the new rows and append them to the '
+                             'existing output (xlsx or csv output)')
+    parser.add_argument('--workers', type=int, default=1, help='processes used for a .txt list of files')
+    parser.add_argument('--score-workers', type=int, default=1, metavar='PROCESSES',
+                        help='processes scoring and normalizing the columns of one file, sharing its values through '
+                             'shared memory, for very wide sheets (1000 columns or more, default: 1)')
+    parser.add_argument('--sweep', nargs='+', type=parse_thresholds, metavar='THRESHOLDS',
+                        help='classify for every threshold given, as values or START:STOP:STEP ranges (STOP '
+                             'included), and write a summary workbook with good/wrong counts and columns')
+    parser.add_argument('--select', nargs='+', type=float, default=[], metavar='THRESHOLD',
+                        help='thresholds of the sweep for which the full result workbook is written')
+    parser.add_argument('--watch', action='store_true',
+                        help='hot folder: keep watching the directory given as file and process every new file '
+                             'once written, outputs next to the inputs, until interrupted')
+    parser.add_argument('--poll', type=float, default=2.0, metavar='SECONDS',
+                        help='with --watch, seconds between two scans of the directory (default: 2)')
+    parser.add_argument('--report', metavar='FILE',
+                        help='append a JSON line per file with time, CPU, rows/columns and memory of every stage')
+    parser.add_argument('--profile-dir', help='with --report, also dump a cProfile file per processed file here')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='with --report, also record the peak allocation of every stage (slower)')
+    parser.add_argument('--cache-dir', help='keep intermediate arrays in this directory, so a run with only another '
+                                            'threshold skips loading, background subtraction and scoring; the '
+                                            'output is still written in full, as with --streaming (values only)')
+    parser.add_argument('--cache-size', type=int, default=1024, help='cache size limit in MB (default: 1024)')
+    arguments = parser.parse_args(argv)
+    if arguments.sweep is None and arguments.threshold is None:
+        parser.error('the following arguments are required: -t/--threshold (or --sweep)')
+    if arguments.sweep is not None:
+        arguments.sweep = [threshold for thresholds in arguments.sweep for threshold in thresholds]
+        if arguments.file.lower().endswith('.txt') or arguments.watch:
+            parser.error('--sweep needs a single excel file')
+        if arguments.incremental:
+            parser.error('--sweep cannot be used with --incremental')
+        unknown = ['{:g}'.format(threshold) for threshold in arguments.select if threshold not in arguments.sweep]
+        if unknown:
+            parser.error('--select thresholds are not in --sweep: {}'.format(' '.join(unknown)))
+    elif arguments.select:
+        parser.error('--select needs --sweep')
+    return arguments
+
+
+def parse_thresholds(value):
+    try:
+        if ':' in value:
+            start, stop, step = (float(part) for part in value.split(':'))
+            if step <= 0:
+                raise ValueError
+            count = int(round((stop - start) / step)) + 1
+            thresholds = [start + i * step for i in range(count) if start + i * step <= stop + step / 1e6]
+        else:
+            thresholds = [float(value)]
+    except ValueError:
+        raise argparse.ArgumentTypeError('not a threshold or START:STOP:STEP range: {}'.format(value))
+    if not all(0 <= threshold <= 100 for threshold in thresholds):
+        raise argparse.ArgumentTypeError('thresholds should be between 0 and 100: {}'.format(value))
+    # WHOLE NUMBERS STAY INTEGERS, AS IN SHEET TITLES AND FILE NAMES OF A SINGLE THRESHOLD RUN
+    return [int(threshold) if threshold.is_integer() else round(threshold, 6) for threshold in thresholds]
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    # IMPORTED AFTER PARSING SO THAT --help AND ARGUMENT ERRORS DO NOT LOAD NUMPY AND OPENPYXL
+    from excel_filter import ExcelFilter, validate_excel_file_content, validate_inputs
+
+    errors = validate_inputs(arguments.file, arguments.threshold, arguments.first_range, arguments.second_range,
+                             arguments.mean_range, arguments.watch)
+    if errors:
+        for error in errors:
+            logging.error(error)
+        return 2
+    first_range = [int(value) for value in arguments.first_range]
+    second_range = [int(value) for value in arguments.second_range]
+    mean_range = [int(value) for value in arguments.mean_range]
+    # FILES OF A .txt LIST OR OF A WATCHED DIRECTORY ARE CHECKED ONE BY ONE BEFORE THEY ARE PROCESSED
+    if not arguments.watch and validate_excel_file_content(arguments.file, first_range, second_range, mean_range,
+                                                           arguments.skip_normalization):
+        return 2
+    cache = None
+    if arguments.cache_dir is not None:
+        from result_cache import ResultCache
+        cache = ResultCache(arguments.cache_dir, arguments.cache_size * 2 ** 20)
+    instrumentation = None
+    if arguments.report is not None:
+        from instrumentation import StageRecorder
+        instrumentation = StageRecorder(arguments.report, arguments.profile_dir, arguments.trace_memory)
+    excel_processor = ExcelFilter(streaming=arguments.streaming, workers=arguments.workers, cache=cache,
+                                  instrumentation=instrumentation, output_format=arguments.output_format,
+                                  chunk_rows=arguments.chunk_rows, incremental=arguments.incremental,
+                                  statistic=arguments.statistic, score_workers=arguments.score_workers)
+    if arguments.watch:
+        excel_processor.watch_directory(arguments.file, int(arguments.threshold), first_range, second_range,
+                                        arguments.skip_background, arguments.skip_normalization, mean_range,
+                                        arguments.poll)
+        return 0
+    if arguments.sweep is not None:
+        excel_processor.sweep_thresholds(arguments.file, arguments.sweep, first_range, second_range,
+                                         arguments.skip_background, arguments.skip_normalization,
+                                         arguments.select, mean_range)
+        return 0
+    results = excel_processor.process_excel_file(arguments.file, int(arguments.threshold), first_range, second_range,
+                                                 arguments.skip_background, arguments.skip_normalization, mean_range)
+    if results and any(result['error'] is not None for result in results):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1204 @@
+import collections
+import hashlib
+import itertools
+import json
+import os
+import openpyxl
+import numpy as np
+import logging
+import sys
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+
+# LOGGER
+logging.basicConfig(
+    format='%(asctime)s %(levelname)-8s %(message)s',
+    level=logging.INFO,
+    datefmt='%Y-%m-%d %H:%M:%S')
+
+
+class ExcelFilter:
+
+    def __init__(self, streaming=False, workers=1, cache=None, instrumentation=None, output_format=None,
+                 chunk_rows=None, incremental=False, statistic=None, score_workers=1):
+        self.streaming = streaming
+        # PROCESSES SCORING AND NORMALIZING THE COLUMNS OF ONE WIDE SHEET THROUGH SHARED MEMORY (SEE parallel.py)
+        self.score_workers = score_workers
+        self.column_scorer = None
+        # RANGE STATISTIC COMPARED BY calculate_percentage_difference, ONE OF Constant.STATISTICS
+        self.statistic = statistic or Constant.STATISTIC_MEAN
+        # KEEP A STATE FILE PER INPUT AND ONLY APPEND THE NEW ROWS ON THE NEXT RUN (SEE append_new_rows)
+        self.incremental = incremental
+        # OUT-OF-CORE MODE WHEN SET: THE INPUT IS STREAMED TWICE, chunk_rows ROWS AT A TIME (SEE scan_chunks)
+        self.chunk_rows = chunk_rows
+        self.row_count = 0
+        self.output_format = output_format or Constant.XLSX_FORMAT
+        self.workers = workers
+        self.cache = cache
+        # instrumentation.StageRecorder, OFF (None) BY DEFAULT
+        self.instrumentation = instrumentation
+        self.first_range = []
+        self.second_range = []
+        self.percentage_threshold = None
+        self.skip_background = False
+        self.skip_normalization = False
+        self.mean_range = [Constant.MEAN_MIN_ROW, Constant.MEAN_MAX_ROW]
+        self.excel_output_file = None
+        self.report_file_wrong = None
+        self.report_file_good = None
+        self.workbook = None
+        self.source = None
+        self.sheets = {}
+        self.filtered_sheet = None
+        self.column_selections = {}
+        self.range_statistics = None
+        self.column_means = None
+        # ColumnResults OF THE LAST FILE, ALSO RETURNED BY main
+        self.results = None
+        self.good_count = 0
+        self.wrong_count = 0
+        # OPTIONAL HOOKS FOR CALLERS RUNNING THE PROCESSING IN A WORKER THREAD:
+        # progress_callback(stage, file_number, file_count) AND A threading.Event TO CANCEL BETWEEN STAGES
+        self.progress_callback = None
+        self.cancel_event = None
+        self.file_number = 1
+        self.file_count = 1
+
+    def process_excel_file(self, file, threshold, first_range, second_range, skip_background, skip_normalization,
+                           mean_range=None):
+        self.set_parameters(threshold, first_range, second_range, skip_background, skip_normalization, mean_range)
+        # ONE RESULT DICT PER FILE (SEE file_result) FOR A LIST AS FOR A SINGLE FILE, THE ColumnResults OF A SINGLE
+        # FILE ALSO STAY IN self.results. ERRORS OF A SINGLE FILE ARE RAISED, THE FILES OF A LIST ARE SKIPPED.
+        if self.verify_file(file):
+            return self.process_batch(self.read_file_list(file))
+        else:
+            start = time.perf_counter()
+            self.main(file)
+            return [self.file_result(file, time.perf_counter() - start)]
+
+    def file_result(self, excel_file, seconds, error=None):
+        # results IS ColumnResults.to_dict() (PLAIN LISTS, IT CROSSES PROCESS AND JSON BOUNDARIES), None ON ERROR
+        results = self.results.to_dict() if error is None and self.results is not None else None
+        return {'file': excel_file, 'seconds': seconds, 'good': self.good_count, 'wrong': self.wrong_count,
+                'output': self.excel_output_file, 'error': error, 'results': results}
+
+    @staticmethod
+    def read_file_list(file):
+        with open(file) as fp:
+            return [line.strip() for line in fp if line.strip()]
+
+    def watch_directory(self, directory, threshold, first_range, second_range, skip_background, skip_normalization,
+                        mean_range=None, poll_seconds=None, stop_event=None):
+        self.set_parameters(threshold, first_range, second_range, skip_background, skip_normalization, mean_range)
+        import watcher
+        folder_watcher = watcher.FolderWatcher(directory, self.batch_parameters(), self.workers,
+                                               poll_seconds or Constant.WATCH_POLL_SECONDS)
+        return folder_watcher.run(stop_event)
+
+    def set_parameters(self, threshold, first_range, second_range, skip_background, skip_normalization,
+                       mean_range=None):
+        if mean_range is not None:
+            self.mean_range = mean_range
+        self.first_range = first_range
+        self.second_range = second_range
+        self.percentage_threshold = threshold
+        self.skip_background = skip_background
+        self.skip_normalization = skip_normalization
+
+    def batch_parameters(self):
+        # CONSTRUCTOR SETTINGS FIRST, THEN THE PROCESSING PARAMETERS
+        options = {'streaming': self.streaming, 'cache': self.cache, 'instrumentation': self.instrumentation,
+                   'output_format': self.output_format, 'chunk_rows': self.chunk_rows, 'incremental': self.incremental,
+                   'statistic': self.statistic, 'score_workers': self.score_workers}
+        return (options, self.percentage_threshold, self.first_range, self.second_range, self.skip_background,
+                self.skip_normalization, self.mean_range)
+
+    def process_batch(self, excel_files):
+        # EVERY FILE RUNS IN ITS OWN ExcelFilter, A FAILING FILE IS REPORTED AND THE BATCH GOES ON
+        parameters = self.batch_parameters()
+        logging.info("processing {} files with {} worker(s)...".format(len(excel_files), self.workers))
+        if self.workers > 1:
+            results = self.process_batch_in_pool(excel_files, parameters)
+        else:
+            results = []
+            for number, excel_file in enumerate(excel_files, 1):
+                hooks = (self.progress_callback, self.cancel_event, number, len(excel_files))
+                results.append(process_batch_entry(excel_file, parameters, hooks))
+        self.log_batch_summary(results)
+        return results
+
+    def process_batch_in_pool(self, excel_files, parameters):
+        # FILES ALREADY RUNNING IN A WORKER ARE FINISHED ON CANCEL, THE ONES STILL QUEUED ARE DROPPED
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            futures = [executor.submit(process_batch_entry, excel_file, parameters) for excel_file in excel_files]
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=Constant.CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                self.check_cancelled()
+                if done:
+                    self.file_number = len(futures) - len(pending)
+                    self.file_count = len(futures)
+                    self.report_progress(Constant.STAGE_DONE)
+            return [future.result() for future in futures]
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def log_batch_summary(results):
+        logging.info(Constant.STARS)
+        for result in results:
+            if result['error'] is None:
+                logging.info("{file}: {seconds:.2f} s, {good} good, {wrong} wrong -> '{output}'".format(**result))
+            else:
+                logging.error("{file}: {seconds:.2f} s, FAILED: {error}".format(**result))
+        failed = len([result for result in results if result['error'] is not None])
+        logging.info("{} files processed, {} failed".format(len(results) - failed, failed))
+        logging.info(Constant.STARS)
+
+    @staticmethod
+    def verify_file(file):
+        if file.lower().endswith(Constant.TXT):
+            return True
+        else:
+            return False
+
+    def main(self, excel_file):
+        with self.instrumented_file(excel_file) as report:
+            if self.incremental and self.append_new_rows(excel_file):
+                report['output'] = self.excel_output_file
+                return self.results
+            self.prepare_output_files(excel_file)
+            report['output'] = self.excel_output_file
+            try:
+                cache_key = self.load_sheet_to_filter(excel_file)
+                self.filter_and_save(excel_file, cache_key)
+            finally:
+                self.close_column_scorer()
+            if self.incremental:
+                self.write_incremental_state(excel_file)
+            return self.results
+
+    def instrumented_file(self, excel_file):
+        if self.instrumentation is None:
+            return nullcontext({})
+        return self.instrumentation.file(excel_file)
+
+    @contextmanager
+    def stage(self, name):
+        self.report_progress(name)
+        if self.instrumentation is None:
+            yield
+        else:
+            with self.instrumentation.stage(name, self.stage_shape):
+                yield
+
+    def stage_shape(self):
+        sheet = self.filtered_sheet if self.filtered_sheet is not None else self.source
+        if sheet is None:
+            sheet = self.sheets.get(Constant.SHEET_BACKGROUND_SUBTRACTED)
+        if sheet is None:
+            return 0, 0
+        # IN CHUNKED MODE THE SHEETS ONLY HOLD THE HEADER, row_count IS THE NUMBER OF ROWS STREAMED
+        return (self.row_count if self.chunk_rows is not None else len(sheet.values)), sheet.values.shape[1]
+
+    def load_sheet_to_filter(self, excel_file):
+        self.source = None
+        self.filtered_sheet = None
+        self.sheets = {}
+        self.column_selections = {}
+        self.range_statistics = None
+        self.column_means = None
+        if self.chunk_rows is not None:
+            # THE CACHE HOLDS WHOLE ARRAYS, IT IS NOT USED IN CHUNKED MODE
+            with self.stage(Constant.STAGE_OPEN):
+                self.scan_chunks(excel_file)
+            return None
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.key(excel_file, [self.first_range, self.second_range, self.skip_background,
+                                                    self.skip_normalization, self.mean_range])
+        with self.stage(Constant.STAGE_OPEN):
+            restored = cache_key is not None and self.restore_cached_arrays(cache_key)
+            if not restored:
+                self.open_excel_file(excel_file)
+            else:
+                # NO FULL LOAD ON A HIT, EVEN WITHOUT STREAMING: THE OUTPUT IS WRITTEN BY save_excel_file_streaming,
+                # THE INPUT SHEETS ARE STREAMED AGAIN FROM THE INPUT FILE (VALUES ONLY, STYLES ARE LOST)
+                self.workbook = None
+        if not restored and not self.skip_background:
+            with self.stage(Constant.STAGE_BACKGROUND):
+                self.subtract_background()
+        return cache_key
+
+    def filter_and_save(self, excel_file, cache_key=None):
+        # RESULT SHEETS OF A PREVIOUS CALL (ANOTHER THRESHOLD OF A SWEEP) ARE DROPPED, THE BACKGROUND SHEET STAYS
+        self.sheets = {title: sheet for title, sheet in self.sheets.items()
+                       if title == Constant.SHEET_BACKGROUND_SUBTRACTED}
+        self.column_selections = {}
+        with self.stage(Constant.STAGE_FILTER):
+            self.filter_columns()
+        if not self.skip_normalization:
+            with self.stage(Constant.STAGE_NORMALIZE):
+                self.calculate_mean_and_normalize_roi()
+        if cache_key is not None:
+            self.store_cached_arrays(cache_key)
+        with self.stage(Constant.STAGE_SAVE):
+            self.save_excel_file(excel_file)
+
+    def save_excel_file(self, excel_file):
+        logging.info("writing processed data to: '{}'".format(self.excel_output_file))
+        if self.chunk_rows is not None:
+            self.save_chunks(excel_file)
+        elif self.output_format != Constant.XLSX_FORMAT:
+            import backends
+            backends.write_sheets(self.excel_output_file, self.sheets.values(), self.output_format)
+        elif self.streaming or self.workbook is None:
+            self.save_excel_file_streaming(excel_file)
+        else:
+            self.write_result_sheets(self.workbook, self.sheets.values())
+            self.workbook.save(self.excel_output_file)
+            # THE LOADED WORKBOOK IS LEFT AS IT WAS READ
+            for sheet in self.sheets.values():
+                self.workbook.remove(self.workbook[sheet.title])
+
+    def sweep_thresholds(self, file, thresholds, first_range, second_range, skip_background, skip_normalization,
+                         selected_thresholds=(), mean_range=None):
+        # THE PERCENTAGE DIFFERENCE DOES NOT DEPEND ON THE THRESHOLD: THE FILE IS LOADED AND SCORED ONCE, THEN
+        # EVERY THRESHOLD IS A COMPARISON. FULL WORKBOOKS ARE ONLY WRITTEN FOR selected_thresholds.
+        # THE THRESHOLD IS SET BY sweep_loaded_file FOR EVERY WORKBOOK WRITTEN
+        self.set_parameters(None, first_range, second_range, skip_background, skip_normalization, mean_range)
+        self.check_file_extension(file)
+        try:
+            return self.sweep_loaded_file(file, thresholds, selected_thresholds)
+        finally:
+            self.close_column_scorer()
+
+    def sweep_loaded_file(self, file, thresholds, selected_thresholds):
+        cache_key = self.load_sheet_to_filter(file)
+        sheet = self.get_sheet_to_filter()
+        difference = self.calculate_column_differences(sheet)
+        titled = sheet.titled_columns()
+        titles = [sheet.titles[i] for i in np.flatnonzero(titled)]
+        summary = []
+        membership = []
+        for threshold in thresholds:
+            good, wrong = self.classify_columns(difference, titled, threshold)
+            summary.append({'threshold': threshold, 'good': int(np.count_nonzero(good)),
+                            'wrong': int(np.count_nonzero(wrong)), 'output': None})
+            membership.append(good[titled])
+        for result in summary:
+            if result['threshold'] in selected_thresholds:
+                self.percentage_threshold = result['threshold']
+                self.prepare_output_files(file)
+                self.filter_and_save(file, cache_key)
+                result['output'] = self.excel_output_file
+        summary_file = os.path.splitext(self.create_output_excel_file_name(file, Constant.THRESHOLD_SWEEP))[0] + \
+            Constant.XLSX
+        logging.info("writing threshold sweep to: '{}'".format(summary_file))
+        self.write_sweep_summary(summary_file, summary, titles, membership)
+        return summary
+
+    @staticmethod
+    def write_sweep_summary(summary_file, summary, titles, membership):
+        workbook = openpyxl.Workbook(write_only=True)
+        summary_sheet = workbook.create_sheet(Constant.SHEET_SWEEP_SUMMARY)
+        summary_sheet.append(['threshold', 'good', 'wrong', 'output'])
+        for result in summary:
+            summary_sheet.append([result['threshold'], result['good'], result['wrong'], result['output']])
+        # ONE ROW PER ROI, ONE COLUMN PER THRESHOLD: 1 IF THE ROI IS GOOD AT THIS THRESHOLD, 0 IF IT IS WRONG
+        membership_sheet = workbook.create_sheet(Constant.SHEET_SWEEP_MEMBERSHIP)
+        membership_sheet.append(['ROI'] + [result['threshold'] for result in summary])
+        membership = np.array(membership, dtype=np.int8).reshape(len(summary), len(titles))
+        for title, row in zip(titles, membership.T.tolist()):
+            membership_sheet.append([title] + row)
+        workbook.save(summary_file)
+
+    def restore_cached_arrays(self, cache_key):
+        # THE CACHE HOLDS THE SHEET filter_columns WORKS ON (BACKGROUND SUBTRACTED OR NOT), ITS RANGE MEANS AND,
+        # IF NORMALIZATION RAN, ITS COLUMN MEANS: ONLY CLASSIFICATION AND OUTPUT ARE DONE AGAIN
+        cached = self.cache.load(cache_key)
+        if cached is None:
+            return False
+        arrays, metadata = cached
+        sheet = RoiSheet(metadata['title'], metadata['index_title'], metadata['index'], metadata['titles'],
+                         arrays['values'])
+        if self.skip_background:
+            self.source = sheet
+        else:
+            self.add_sheet(sheet)
+        self.range_statistics = tuple({statistic: arrays['{}_{}'.format(prefix, statistic)]
+                                       for statistic in Constant.STATISTICS} for prefix in ('first', 'second'))
+        if 'column_means' in arrays:
+            self.column_means = arrays['column_means']
+        return True
+
+    def store_cached_arrays(self, cache_key):
+        sheet = self.filtered_sheet
+        arrays = {'values': sheet.values}
+        for prefix, statistics in zip(('first', 'second'), self.range_statistics):
+            for statistic, values in statistics.items():
+                arrays['{}_{}'.format(prefix, statistic)] = values
+        if self.column_means is not None:
+            arrays['column_means'] = self.column_means
+        self.cache.store(cache_key, arrays, {'title': sheet.title, 'index_title': sheet.index_title,
+                                             'index': sheet.index, 'titles': sheet.titles})
+
+    def append_new_rows(self, excel_file):
+        # INCREMENTAL MODE: CLASSIFICATION RANGES AND THE MEAN WINDOW ARE AT THE TOP OF THE SHEET, ONCE THEY ARE
+        # WRITTEN THE GOOD/WRONG COLUMNS AND THE COLUMN MEANS DO NOT CHANGE. IF THE PARAMETERS AND THE TOP ROWS ARE
+        # THE SAME AS IN THE STATE OF THE LAST RUN, ONLY THE ROWS ADDED SINCE ARE PROCESSED AND APPENDED TO THE
+        # EXISTING OUTPUT. RETURNS False WHEN A FULL RUN IS NEEDED.
+        state = self.read_incremental_state(excel_file)
+        if state is None:
+            return False
+        self.excel_output_file = state['output']
+        self.column_selections = {title: np.array(columns, dtype=bool)
+                                  for title, columns in state['column_selections'].items()}
+        self.column_means = np.array(state['column_means']) if state['column_means'] is not None else None
+        self.set_results(ColumnResults.from_dict(state['results']))
+        with self.open_input_rows(excel_file) as (title, rows):
+            header = next(rows, ())
+            head = list(itertools.islice(rows, self.head_row_count()))
+            if self.head_digest(header, head) != state['head_digest'] or title != state['sheet_title']:
+                logging.info("top rows of '{}' changed since the last run, processing it again...".format(excel_file))
+                return False
+            new_rows = list(itertools.islice(rows, state['rows'] - len(head), None))
+        if not new_rows:
+            logging.info("no new row in '{}' since the last run...".format(excel_file))
+            return True
+        logging.info("appending {} new rows to: '{}'".format(len(new_rows), self.excel_output_file))
+        with self.stage(Constant.STAGE_SAVE):
+            self.append_rows_to_output(title, header, new_rows)
+        state['rows'] += len(new_rows)
+        self.write_json(self.incremental_state_file(excel_file), state)
+        return True
+
+    def append_rows_to_output(self, title, header, new_rows):
+        if self.output_format == Constant.CSV_FORMAT:
+            import backends
+            with backends.CsvSheetWriters(self.excel_output_file, 'a') as writers:
+                self.write_chunks(title, [header] + new_rows, writers, Constant.ROW_BUFFER_SIZE)
+            return
+        # THE OUTPUT IS STREAMED FROM A READ-ONLY WORKBOOK TO A WRITE-ONLY ONE, EVERY SHEET GETS ITS NEW ROWS AFTER
+        # ITS EXISTING ONES: MEMORY DEPENDS ON THE NEW ROWS ONLY, NOT ON THE SIZE OF THE OUTPUT
+        appended = collections.defaultdict(list, {title: new_rows})
+        self.write_chunks(title, [header] + new_rows, appended, Constant.ROW_BUFFER_SIZE)
+        temporary_file = '{}.{}.tmp'.format(self.excel_output_file, os.getpid())
+        source = openpyxl.load_workbook(self.excel_output_file, read_only=True)
+        try:
+            workbook = openpyxl.Workbook(write_only=True)
+            self.copy_sheets(source, workbook, appended)
+            workbook.save(temporary_file)
+        finally:
+            source.close()
+        # THE OUTPUT IS ONLY REPLACED ONCE THE NEW ONE IS COMPLETE
+        os.replace(temporary_file, self.excel_output_file)
+
+    def write_incremental_state(self, excel_file):
+        if self.output_format not in (Constant.XLSX_FORMAT, Constant.CSV_FORMAT):
+            logging.info("{} output cannot be appended to, no incremental state written...".format(
+                self.output_format))
+            return
+        sheet = self.get_sheet_to_filter()
+        with self.open_input_rows(excel_file) as (title, rows):
+            header = next(rows, ())
+            head = list(itertools.islice(rows, self.head_row_count()))
+        state = {'version': Constant.INCREMENTAL_VERSION, 'parameters': self.incremental_parameters(),
+                 'output': self.excel_output_file, 'sheet_title': title, 'head_digest': self.head_digest(header, head),
+                 'rows': self.row_count if self.chunk_rows is not None else len(sheet.index),
+                 'column_selections': {name: columns.tolist() for name, columns in self.column_selections.items()},
+                 'column_means': self.column_means.tolist() if self.column_means is not None else None,
+                 'results': self.results.to_dict()}
+        self.write_json(self.incremental_state_file(excel_file), state)
+
+    def read_incremental_state(self, excel_file):
+        state_file = self.incremental_state_file(excel_file)
+        try:
+            with open(state_file) as fp:
+                state = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        if state.get('version') != Constant.INCREMENTAL_VERSION or \
+                state.get('parameters') != self.incremental_parameters():
+            logging.info("parameters changed since the last run of '{}', processing it again...".format(excel_file))
+            return None
+        if not os.path.exists(state['output']):
+            logging.info("output '{}' not found, processing '{}' again...".format(state['output'], excel_file))
+            return None
+        return state
+
+    def incremental_parameters(self):
+        # LISTS, AS READ BACK FROM JSON
+        return [self.percentage_threshold, list(self.first_range), list(self.second_range), self.skip_background,
+                self.skip_normalization, list(self.mean_range), self.output_format, self.statistic]
+
+    def head_row_count(self):
+        # DATA ROWS UP TO THE LAST ROW OF THE FILTER RANGES AND OF THE MEAN WINDOW
+        return max(self.first_range[1], self.second_range[1], self.mean_range[1] + 1) - Constant.DATA_MIN_ROW
+
+    @staticmethod
+    def head_digest(header, head):
+        return hashlib.sha256(json.dumps([list(header)] + [list(row) for row in head], default=str).encode()) \
+            .hexdigest()
+
+    @staticmethod
+    def incremental_state_file(excel_file):
+        directory, name = os.path.split(excel_file)
+        return os.path.join(directory, '.' + name + Constant.INCREMENTAL_STATE)
+
+    @staticmethod
+    def write_json(file, content):
+        # WRITTEN BESIDE AND RENAMED, AN INTERRUPTED RUN NEVER LEAVES A HALF WRITTEN STATE
+        with open(file + '.tmp', 'w') as fp:
+            json.dump(content, fp)
+        os.replace(file + '.tmp', file)
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ProcessingCancelled('Processing cancelled')
+
+    def report_progress(self, stage):
+        self.check_cancelled()
+        if self.progress_callback is not None:
+            self.progress_callback(stage, self.file_number, self.file_count)
+
+    def prepare_output_files(self, file):
+        self.check_file_extension(file)
+        filtered_threshold = Constant.THRESHOLD + str(self.percentage_threshold)
+        self.excel_output_file = self.create_output_excel_file_name(file, filtered_threshold)
+        # CSV, PARQUET AND ARROW OUTPUTS ARE A DIRECTORY WITH ONE FILE PER RESULT SHEET
+        if self.output_format != Constant.XLSX_FORMAT:
+            self.excel_output_file = os.path.splitext(self.excel_output_file)[0]
+        elif not self.is_excel_file(file):
+            self.excel_output_file = os.path.splitext(self.excel_output_file)[0] + Constant.XLSX
+
+    @staticmethod
+    def check_file_extension(excel_file):
+        if not excel_file.lower().endswith(Constant.EXCEL_EXTENSIONS + Constant.DATA_EXTENSIONS):
+            raise TypeError('Not an excel, csv, parquet or arrow file: {}'.format(excel_file))
+
+    @staticmethod
+    def is_excel_file(file):
+        return file.lower().endswith(Constant.EXCEL_EXTENSIONS)
+
+    @staticmethod
+    def create_output_excel_file_name(file, suffix):
+        # ONLY THE LAST EXTENSION IS SPLIT OFF, DOTS IN DIRECTORY NAMES (./in.xlsx) OR IN THE NAME ARE KEPT
+        filename, file_extension = os.path.splitext(file)
+        timestamp = time.strftime("%Y-%m-%d-%H-%M-%S")
+        name = '{}_{}_{}{}'.format(filename, suffix, timestamp, file_extension)
+        return name
+
+    def open_excel_file(self, excel_file):
+        logging.info("opening '{}'...".format(excel_file))
+        if not self.is_excel_file(excel_file):
+            import backends
+            self.source = backends.read_sheet(excel_file)
+            self.workbook = None
+        elif self.streaming:
+            self.open_excel_file_streaming(excel_file)
+        else:
+            self.workbook = openpyxl.load_workbook(excel_file)
+            self.source = RoiSheet.from_rows(self.workbook.active.title,
+                                             self.workbook.active.iter_rows(values_only=True))
+
+    def open_excel_file_streaming(self, excel_file):
+        # ONLY THE ACTIVE SHEET IS READ, ROW BY ROW, INTO THE FLOAT BUFFER
+        # PEAK RSS OF THIS STAGE (benchmarks/open_memory.py, 20000 ROWS x 200 COLUMNS):
+        # FULL LOAD 1687 MB, STREAMING LOAD 92 MB
+        workbook = openpyxl.load_workbook(excel_file, read_only=True)
+        try:
+            sheet = workbook.active
+            self.source = RoiSheet.from_rows(sheet.title, sheet.iter_rows(values_only=True))
+        finally:
+            workbook.close()
+        self.workbook = None
+
+    def scan_chunks(self, excel_file):
+        # PASS 1 OF THE CHUNKED MODE: ONLY THE RUNNING SUMS OF THE TWO FILTER RANGES AND OF THE MEAN WINDOW ARE
+        # KEPT, THE SHEETS HOLD NO ROW. filter_columns AND calculate_mean_and_normalize_roi THEN RUN ON THESE SUMS
+        # AND save_chunks (PASS 2) WRITES THE ROWS. MEMORY DEPENDS ON chunk_rows, NOT ON THE NUMBER OF ROWS.
+        # PEAK RSS OF A RUN (benchmarks/chunked_memory.py, 50 COLUMNS, CHUNKS OF 1000 ROWS):
+        # 2000 ROWS 48 MB STREAMING / 45 MB CHUNKED, 8000 ROWS 72 / 46 MB, 32000 ROWS 166 / 49 MB
+        if self.output_format not in (Constant.XLSX_FORMAT, Constant.CSV_FORMAT):
+            raise ValueError('Chunked processing writes xlsx or csv, not {}'.format(self.output_format))
+        for list_range in (self.first_range, self.second_range):
+            self.check_filter_range(list_range)
+        logging.info("scanning '{}' by chunks of {} rows...".format(excel_file, self.chunk_rows))
+        min_row_mean_calculation, max_row_mean_calculation = self.mean_range
+        # THE FILTER RANGES ARE AT MOST FILTER_MAX_ROW ROWS, THEY ARE KEPT FOR THE ORDER STATISTICS
+        first_sum = RowRangeSum(self.first_range[0], self.first_range[1], keep_rows=True)
+        second_sum = RowRangeSum(self.second_range[0], self.second_range[1], keep_rows=True)
+        mean_sum = RowRangeSum(min_row_mean_calculation, max_row_mean_calculation + 1)
+        self.row_count = 0
+        sheet = None
+        with self.open_rows(excel_file) as (title, rows):
+            for chunk in RoiSheet.iter_chunks(title, rows, self.chunk_rows):
+                self.check_cancelled()
+                sheet = chunk if self.skip_background else self.background_subtracted(chunk)
+                for range_sum in (first_sum, second_sum, mean_sum):
+                    range_sum.add(sheet.values, Constant.DATA_MIN_ROW + self.row_count)
+                self.row_count += len(sheet.index)
+        for list_range, range_sum in ((self.first_range, first_sum), (self.second_range, second_sum)):
+            if not range_sum.is_complete():
+                raise IndexError('Range {} goes past the last row of the sheet'.format(list_range))
+        self.range_statistics = (self.calculate_range_statistics(first_sum.stacked_rows()),
+                                 self.calculate_range_statistics(second_sum.stacked_rows()))
+        # AN INCOMPLETE MEAN WINDOW IS LEFT TO calculate_mean_and_normalize_roi, WHICH ONLY RAISES IF THERE IS
+        # SOMETHING TO NORMALIZE, AS ON A SHEET LOADED IN MEMORY
+        if mean_sum.is_complete():
+            self.column_means = mean_sum.mean()
+        header = RoiSheet(sheet.title, sheet.index_title, [], sheet.titles, np.empty((0, len(sheet.titles))))
+        if self.skip_background:
+            self.source = header
+        else:
+            self.add_sheet(header)
+
+    @contextmanager
+    def open_rows(self, excel_file, workbook=None):
+        # ROWS OF THE ACTIVE SHEET (OR OF A CSV FILE), READ LAZILY. WITH A WRITE-ONLY workbook THE OTHER INPUT
+        # SHEETS ARE COPIED TO IT IN ORDER, THE ACTIVE SHEET IS COPIED AS ITS ROWS ARE CONSUMED
+        if not self.is_excel_file(excel_file):
+            import backends
+            with backends.open_rows(excel_file) as (title, rows):
+                if workbook is not None:
+                    rows = self.copied_rows(rows, workbook.create_sheet(title))
+                yield title, rows
+            return
+        source = openpyxl.load_workbook(excel_file, read_only=True)
+        try:
+            active = source.active
+            rows = active.iter_rows(values_only=True)
+            if workbook is not None:
+                rows = self.copied_rows(rows, self.copy_sheets(source, workbook, lazy_title=active.title))
+            yield active.title, rows
+        finally:
+            source.close()
+
+    @contextmanager
+    def open_input_rows(self, excel_file):
+        # open_rows FOR EVERY INPUT FORMAT OF THE INCREMENTAL MODE: PARQUET AND ARROW HAVE NO LAZY READER, THEIR
+        # TABLE IS READ AS A WHOLE (OR TAKEN FROM self.source WHEN IT IS LOADED) AND GIVEN ROW BY ROW
+        if self.is_excel_file(excel_file) or excel_file.lower().endswith(Constant.CSV):
+            with self.open_rows(excel_file) as (title, rows):
+                yield title, rows
+            return
+        import backends
+        sheet = self.source if self.source is not None else backends.read_sheet(excel_file)
+        yield sheet.title, iter(sheet.iter_rows())
+
+    @staticmethod
+    def copy_sheets(source, workbook, appended=None, lazy_title=None):
+        # VALUES OF EVERY SHEET OF A READ-ONLY source TO A WRITE-ONLY workbook, IN ORDER AND WITH THE SAME ACTIVE
+        # SHEET, EACH FOLLOWED BY ITS ROWS IN appended (TITLE -> ROWS). THE SHEET lazy_title IS ONLY CREATED, ITS
+        # WORKSHEET IS RETURNED FOR THE CALLER TO FILL
+        lazy_worksheet = None
+        for sheet in source.worksheets:
+            worksheet = workbook.create_sheet(sheet.title)
+            if sheet.title == lazy_title:
+                lazy_worksheet = worksheet
+                continue
+            for row in itertools.chain(sheet.iter_rows(values_only=True), (appended or {}).get(sheet.title, ())):
+                worksheet.append(row)
+        workbook.active = source.index(source.active)
+        return lazy_worksheet
+
+    @staticmethod
+    def copied_rows(rows, worksheet):
+        for row in rows:
+            worksheet.append(row)
+            yield row
+
+    def save_chunks(self, excel_file):
+        # PASS 2 OF THE CHUNKED MODE: RESULT SHEETS ARE CREATED FROM THE HEADER ONLY SHEETS OF filter_columns AND
+        # calculate_mean_and_normalize_roi, THEN EVERY CHUNK APPENDS ITS ROWS TO EACH OF THEM
+        if self.output_format == Constant.CSV_FORMAT:
+            import backends
+            with backends.CsvSheetWriters(self.excel_output_file) as csv_writers:
+                writers = self.create_sheet_writers(lambda title: csv_writers[title])
+                with self.open_rows(excel_file) as (title, rows):
+                    self.write_chunks(title, rows, writers)
+            return
+        workbook = openpyxl.Workbook(write_only=True)
+        with self.open_rows(excel_file, workbook) as (title, rows):
+            writers = self.create_sheet_writers(workbook.create_sheet)
+            self.write_chunks(title, rows, writers)
+        workbook.save(self.excel_output_file)
+
+    def create_sheet_writers(self, create_sheet):
+        writers = {}
+        for sheet in self.sheets.values():
+            writer = writers[sheet.title] = create_sheet(sheet.title)
+            # RESULT SHEETS ARE SMALL, THEY ARE WRITTEN AT ONCE. ROI SHEETS ONLY GET THEIR HEADER HERE
+            for row in sheet.iter_rows():
+                writer.append(row)
+        return writers
+
+    def write_chunks(self, title, rows, writers, chunk_rows=None):
+        # writers: SHEET TITLE -> ANYTHING WITH append(row)
+        for chunk in RoiSheet.iter_chunks(title, rows, chunk_rows or self.chunk_rows):
+            self.check_cancelled()
+            for sheet in self.chunk_result_sheets(chunk):
+                writer = writers[sheet.title]
+                for row in itertools.islice(sheet.iter_rows(), 1, None):
+                    writer.append(row)
+
+    def chunk_result_sheets(self, chunk):
+        # SAME COLUMNS AND VALUES AS THE ROI SHEETS OF subtract_background, filter_columns AND
+        # calculate_mean_and_normalize_roi, FOR THE ROWS OF ONE CHUNK
+        sheet = chunk
+        if not self.skip_background:
+            sheet = self.background_subtracted(chunk)
+            yield sheet
+        for title, columns in self.column_selections.items():
+            yield sheet.select_columns(columns, title)
+        if self.column_selections and not self.skip_normalization:
+            normalized = self.normalize(sheet, self.column_means)
+            for title, columns in self.column_selections.items():
+                yield normalized.select_columns(columns, "{} normalized".format(title))
+
+    def subtract_background(self):
+        logging.info("subtracting background...")
+        self.add_sheet(self.background_subtracted(self.source))
+
+    @staticmethod
+    def background_subtracted(sheet):
+        background_index = Constant.BACKGROUND_COLUMN_INDEX - Constant.DATA_MIN_COL
+        background = sheet.values[:, background_index]
+        values = np.delete(sheet.values, background_index, axis=1) - background[:, np.newaxis]
+        # A RESULT OF ZERO MEANS THE ROI COLUMN IS A COPY OF THE BACKGROUND COLUMN
+        duplicates = np.argwhere(values == 0)
+        if len(duplicates) != 0:
+            msg_duplicate_bg_row = "/!\\ ERROR: COLUMN {} IS THE SAME AS BACKGROUND COLUMN".format(
+                duplicates[0][1] + Constant.BACKGROUND_COLUMN_INDEX + 1)
+            sys.exit(msg_duplicate_bg_row)
+        titles = sheet.titles[:background_index] + sheet.titles[background_index + 1:]
+        return RoiSheet(Constant.SHEET_BACKGROUND_SUBTRACTED, sheet.index_title, sheet.index, titles, values)
+
+    def add_sheet(self, sheet):
+        self.sheets[sheet.title] = sheet
+        return sheet
+
+    def get_sheet_to_filter(self):
+        if not self.skip_background:
+            return self.sheets[Constant.SHEET_BACKGROUND_SUBTRACTED]
+        else:
+            return self.source
+
+    def get_column_scorer(self, sheet):
+        # NARROW SHEETS STAY ON ONE CORE, STARTING THE WORKERS WOULD COST MORE THAN THE SCORING. IN CHUNKED MODE THE
+        # SHEETS ONLY HOLD THE HEADER, EVERY CHUNK IS SCORED AND NORMALIZED WHERE IT IS STREAMED.
+        if self.score_workers <= 1 or self.chunk_rows is not None or \
+                sheet.values.shape[1] < Constant.PARALLEL_MIN_COLUMNS:
+            return None
+        if self.column_scorer is None:
+            import parallel
+            self.column_scorer = parallel.ColumnScorer(self.score_workers)
+        return self.column_scorer
+
+    def close_column_scorer(self):
+        if self.column_scorer is not None:
+            self.column_scorer.close()
+        self.column_scorer = None
+
+    def calculate_column_differences(self, sheet):
+        if self.range_statistics is None:
+            list_ranges = (self.first_range, self.second_range)
+            column_scorer = self.get_column_scorer(sheet)
+            if column_scorer is None:
+                self.range_statistics = tuple(self.get_statistics_from_range_of_rows(sheet.values, list_range)
+                                              for list_range in list_ranges)
+            else:
+                self.range_statistics = column_scorer.range_statistics(
+                    sheet.values, [self.get_row_bounds(sheet.values, list_range) for list_range in list_ranges])
+        first_statistics, second_statistics = self.range_statistics
+        return self.calculate_percentage_difference(first_statistics[self.statistic],
+                                                    second_statistics[self.statistic])
+
+    @staticmethod
+    def classify_columns(difference, titled, threshold):
+        # NaN (EMPTY CELL IN A FILTER RANGE) COMPARES FALSE BOTH WAYS, SUCH A COLUMN IS WRONG, NEVER GOOD
+        wrong = titled & ((difference > threshold) | (difference < 0) | np.isnan(difference))
+        good = titled & ~wrong
+        return good, wrong
+
+    def filter_columns(self):
+        sheet = self.get_sheet_to_filter()
+
+        # SCORE ALL COLUMNS AT ONCE AND IDENTIFY BAD COLUMNS GIVEN THE THRESHOLD PERCENTAGE
+        logging.info("filtering ROIs...")
+        self.filtered_sheet = sheet
+        titles = sheet.titles
+        difference = self.calculate_column_differences(sheet)
+        good, wrong = self.classify_columns(difference, sheet.titled_columns(), self.percentage_threshold)
+        for column in np.flatnonzero(sheet.titled_columns() & np.isnan(difference)):
+            logging.warning("column {} has an empty cell in the filter ranges, classified wrong...".format(
+                titles[column]))
+
+        first_mean, second_mean = (statistics[Constant.STATISTIC_MEAN] for statistics in self.range_statistics)
+        classified = np.flatnonzero(sheet.titled_columns())
+        self.set_results(ColumnResults(classified, np.array([titles[i] for i in classified], dtype=object),
+                                       first_mean[classified], second_mean[classified], difference[classified],
+                                       good[classified]))
+
+        # SPLIT COLUMNS IF WRONG COLUMNS ARE FOUND
+        if wrong.any():
+            logging.info("{} good columns found...".format(str(self.good_count)))
+            logging.info("{} wrong columns found...".format(str(self.wrong_count)))
+            logging.info("deleting columns...")
+            self.column_selections = {Constant.SHEET_GOOD_ROI: ~wrong, Constant.SHEET_WRONG_ROI: ~good}
+            for title, columns in self.column_selections.items():
+                self.add_sheet(sheet.select_columns(columns, title))
+            # CREATE NEW SHEETS TO WRITE PERCENTAGE CALCULATION RESULTS
+            result_above_threshold_title = "{} {} %".format(Constant.RESULT_ABOVE, str(self.percentage_threshold))
+            result_below_threshold_title = "{} {} %".format(Constant.RESULT_BELOW, str(self.percentage_threshold))
+            results = self.results
+            self.add_sheet(PairSheet(result_above_threshold_title, results.pairs(results.difference, ~results.good)))
+            self.add_sheet(PairSheet(result_below_threshold_title, results.pairs(results.difference, results.good)))
+        else:
+            logging.critical("no column to delete...")
+
+    def set_results(self, results):
+        self.results = results
+        self.good_count = int(np.count_nonzero(results.good))
+        self.wrong_count = len(results) - self.good_count
+
+    @staticmethod
+    def check_filter_range(list_range):
+        if list_range[0] < Constant.DATA_MIN_ROW or list_range[1] - 1 > Constant.FILTER_MAX_ROW:
+            raise IndexError('Range {} is outside rows {} to {}'.format(
+                list_range, Constant.DATA_MIN_ROW, Constant.FILTER_MAX_ROW))
+
+    @staticmethod
+    def get_row_bounds(values, list_range):
+        ExcelFilter.check_filter_range(list_range)
+        start, stop = list_range[0] - Constant.DATA_MIN_ROW, list_range[1] - Constant.DATA_MIN_ROW
+        if len(values[start:stop]) != stop - start:
+            raise IndexError('Range {} goes past the last row of the sheet'.format(list_range))
+        return start, stop
+
+    @staticmethod
+    def get_statistics_from_range_of_rows(values, list_range):
+        start, stop = ExcelFilter.get_row_bounds(values, list_range)
+        return ExcelFilter.calculate_range_statistics(values[start:stop])
+
+    @staticmethod
+    def calculate_range_statistics(rows):
+        # EVERY STATISTIC OF EVERY COLUMN FROM ONE SORT OF THE RANGE: MEDIAN AND TRIMMED MEAN ARE READ FROM THE
+        # SORTED BLOCK. THE MEAN IS STILL SUMMED ROW BY ROW (SAME VALUES AS BEFORE), THE STANDARD DEVIATION
+        # (POPULATION) REUSES IT. A COLUMN WITH AN EMPTY CELL IN THE RANGE GETS NaN FOR ALL OF THEM, SO IT IS
+        # CLASSIFIED WRONG WHATEVER THE STATISTIC (SEE classify_columns).
+        count = len(rows)
+        mean = ExcelFilter.sum_rows(rows) / count
+        ordered = np.sort(rows, axis=0)
+        middle = count // 2
+        median = ordered[middle] if count % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+        cut = int(Constant.TRIM_PROPORTION * count)
+        trimmed_mean = ordered[cut:count - cut].mean(axis=0)
+        std = np.sqrt(((rows - mean) ** 2).mean(axis=0))
+        empty = np.isnan(mean)
+        for statistic in (median, trimmed_mean):
+            statistic[empty] = np.nan
+        return {Constant.STATISTIC_MEAN: mean, Constant.STATISTIC_MEDIAN: median, Constant.STATISTIC_STD: std,
+                Constant.STATISTIC_TRIMMED_MEAN: trimmed_mean}
+
+    @staticmethod
+    def sum_rows(rows, total=None):
+        # ADD ROW AFTER ROW SO EACH COLUMN IS SUMMED IN SHEET ORDER, AS THE CELL BY CELL LOOP DID
+        if total is None:
+            total = np.zeros(rows.shape[1])
+        for row in rows:
+            total += row
+        return total
+
+    @staticmethod
+    def calculate_percentage_difference(first_value, second_value):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = (np.abs(first_value - second_value) / second_value) * 100.0
+        # A ZERO SECOND VALUE GIVES 0 %, UNLESS THE FIRST ONE IS NaN
+        return np.where((second_value == 0) & ~np.isnan(first_value), 0.0, result)
+
+    def calculate_mean_and_normalize_roi(self):
+        # GOOD AND WRONG ROI ARE COLUMNS OF THE SAME FILTERED BLOCK: MEANS ARE COMPUTED AND THE BLOCK IS NORMALIZED
+        # ONCE, THEN BOTH NORMALIZED SHEETS ARE GATHERED FROM IT. EACH COLUMN USES ITS OWN MEAN.
+        if not self.column_selections:
+            logging.critical("no ROI sheet to normalize...")
+            return
+        sheet = self.filtered_sheet
+        min_row_mean_calculation, max_row_mean_calculation = self.mean_range
+        logging.info("calculating means and normalizing ROIs...")
+        logging.info("mean minimum row: {}...".format(min_row_mean_calculation))
+        logging.info("mean maximum row: {}...".format(max_row_mean_calculation))
+        if self.column_means is None:
+            window = sheet.values[min_row_mean_calculation - Constant.DATA_MIN_ROW:
+                                  max_row_mean_calculation - Constant.DATA_MIN_ROW + 1]
+            if min_row_mean_calculation < Constant.DATA_MIN_ROW or \
+                    len(window) != max_row_mean_calculation - min_row_mean_calculation + 1:
+                raise IndexError('Mean range {} is outside the rows of the sheet'.format(self.mean_range))
+            self.column_means = self.sum_rows(window) / len(window)
+        results = self.results
+        results.column_mean = self.column_means[results.column]
+        selections = [(self.column_selections[sheet_title], "{} normalized".format(sheet_title))
+                      for sheet_title in (Constant.SHEET_GOOD_ROI, Constant.SHEET_WRONG_ROI)]
+        column_scorer = self.get_column_scorer(sheet)
+        if column_scorer is None:
+            normalized = self.normalize(sheet, self.column_means)
+            normalized_sheets = [normalized.select_columns(columns, title) for columns, title in selections]
+        else:
+            normalized_sheets = column_scorer.normalized_selections(sheet, self.column_means, selections)
+        mean_selections = ((Constant.MEAN_GOOD_ROI, results.good), (Constant.MEAN_WRONG_ROI, ~results.good))
+        for normalized_sheet, (mean_sheet_title, classified) in zip(normalized_sheets, mean_selections):
+            self.add_sheet(normalized_sheet)
+            self.add_sheet(PairSheet(mean_sheet_title, results.pairs(results.column_mean, classified)))
+
+    @staticmethod
+    def normalize(sheet, means):
+        values = sheet.values.copy()
+        ExcelFilter.normalize_columns(values, means, sheet.titled_columns())
+        return RoiSheet(None, sheet.index_title, sheet.index, sheet.titles, values)
+
+    @staticmethod
+    def normalize_columns(values, means, titled):
+        values[:, titled] = (values[:, titled] - means[titled]) / means[titled]
+
+    def save_excel_file_streaming(self, excel_file):
+        # WRITE-ONLY WORKBOOK: EVERY SHEET IS SERIALIZED ROW BY ROW, INPUT SHEETS ARE STREAMED AGAIN FROM THE
+        # INPUT FILE (VALUES ONLY, STYLES ARE LOST) AND RESULT SHEETS ARE GENERATED FROM THE ARRAYS
+        workbook = openpyxl.Workbook(write_only=True)
+        if not self.is_excel_file(excel_file):
+            import backends
+            source = self.source if self.source is not None else backends.read_sheet(excel_file)
+            self.write_result_sheets(workbook, [source] + list(self.sheets.values()))
+            workbook.save(self.excel_output_file)
+            return
+        source = openpyxl.load_workbook(excel_file, read_only=True)
+        try:
+            self.copy_sheets(source, workbook)
+        finally:
+            source.close()
+        self.write_result_sheets(workbook, self.sheets.values())
+        workbook.save(self.excel_output_file)
+
+    @staticmethod
+    def write_result_sheets(wb, sheets):
+        for sheet in sheets:
+            worksheet = wb.create_sheet(sheet.title)
+            for row in sheet.iter_rows():
+                worksheet.append(row)
+
+
+def process_batch_entry(excel_file, parameters, hooks=None):
+    options, threshold, first_range, second_range, skip_background, skip_normalization, mean_range = parameters
+    excel_filter = ExcelFilter(**options)
+    if hooks is not None:
+        excel_filter.progress_callback, excel_filter.cancel_event, excel_filter.file_number, \
+            excel_filter.file_count = hooks
+    excel_filter.set_parameters(threshold, first_range, second_range, skip_background, skip_normalization, mean_range)
+    start = time.perf_counter()
+    # A FILE WITH BAD ROWS OR CELLS IS SKIPPED BEFORE IT IS LOADED
+    errors = validate_excel_file_content(excel_file, first_range, second_range, mean_range, skip_normalization)
+    error = '; '.join(errors) or None
+    try:
+        if error is None:
+            excel_filter.main(excel_file)
+    except ProcessingCancelled:
+        raise
+    # subtract_background EXITS ON A DUPLICATED BACKGROUND COLUMN, ONLY THIS FILE IS SKIPPED
+    except (Exception, SystemExit) as e:
+        error = str(e) or type(e).__name__
+    return excel_filter.file_result(excel_file, time.perf_counter() - start, error)
+
+
+class ProcessingCancelled(Exception):
+    pass
+
+
+class RoiSheet:
+    # FIRST COLUMN IS KEPT AS IS, EVERY OTHER COLUMN IS HELD IN A 2-D FLOAT ARRAY (EMPTY CELLS ARE NaN)
+
+    def __init__(self, title, index_title, index, titles, values):
+        self.title = title
+        self.index_title = index_title
+        self.index = index
+        self.titles = titles
+        self.values = values
+
+    @classmethod
+    def from_rows(cls, title, rows):
+        # ROWS ARE COPIED ONE BY ONE INTO A GROWING FLOAT BUFFER, NO CELL OBJECT IS KEPT AROUND
+        rows = iter(rows)
+        header = next(rows, ())
+        width = max(len(header) - 1, 0)
+        index = []
+        values = np.empty((Constant.ROW_BUFFER_SIZE, width))
+        for row in rows:
+            if len(index) == len(values):
+                values.resize((2 * len(values), width), refcheck=False)
+            cells = row[1:]
+            if len(cells) != width:
+                cells = (tuple(cells) + (None,) * width)[:width]
+            values[len(index)] = cells
+            index.append(row[0])
+        values.resize((len(index), width), refcheck=False)
+        return cls(title, header[0] if header else None, index, list(header[1:]), values)
+
+    @classmethod
+    def iter_chunks(cls, title, rows, chunk_rows):
+        # from_rows APPLIED chunk_rows ROWS AT A TIME, EVERY CHUNK HAS THE HEADER OF THE SHEET
+        rows = iter(rows)
+        header = next(rows, ())
+        while True:
+            chunk = cls.from_rows(title, itertools.chain([header], itertools.islice(rows, chunk_rows)))
+            if not chunk.index:
+                return
+            yield chunk
+
+    def titled_columns(self):
+        return np.array([title is not None for title in self.titles], dtype=bool)
+
+    def select_columns(self, columns, title):
+        # ONE GATHER OF THE KEPT COLUMNS, COST DOES NOT DEPEND ON HOW MANY COLUMNS ARE DROPPED
+        kept = np.flatnonzero(columns)
+        return RoiSheet(title, self.index_title, self.index, [self.titles[i] for i in kept], self.values[:, kept])
+
+    def iter_rows(self):
+        yield [self.index_title] + self.titles
+        has_empty_cells = np.isnan(self.values).any()
+        for index, row in zip(self.index, self.values.tolist()):
+            if has_empty_cells:
+                row = [None if value != value else value for value in row]
+            yield [index] + row
+
+
+class ColumnResults:
+    # ONE ENTRY PER CLASSIFIED ROI COLUMN (TITLED COLUMNS OF THE FILTERED SHEET), IN SHEET ORDER, EACH FIELD IN ONE
+    # ARRAY. column IS THE POSITION IN THE FILTERED SHEET, SO TWO ROI WITH THE SAME TITLE STAY APART.
+    # column_mean IS NaN UNTIL NORMALIZATION RUNS.
+    __slots__ = ('column', 'title', 'first_mean', 'second_mean', 'difference', 'good', 'column_mean')
+
+    def __init__(self, column, title, first_mean, second_mean, difference, good, column_mean=None):
+        self.column = column
+        self.title = title
+        self.first_mean = first_mean
+        self.second_mean = second_mean
+        self.difference = difference
+        self.good = good
+        self.column_mean = column_mean if column_mean is not None else np.full(len(column), np.nan)
+
+    def __len__(self):
+        return len(self.column)
+
+    def pairs(self, values, selection):
+        return list(zip(self.title[selection].tolist(), values[selection].tolist()))
+
+    def to_records(self):
+        # NUMPY RECORD ARRAY, ONE RECORD PER COLUMN (pandas.DataFrame.from_records ACCEPTS IT AS IS)
+        return np.rec.fromarrays([getattr(self, field) for field in self.__slots__], names=list(self.__slots__))
+
+    def to_dict(self):
+        return {field: getattr(self, field).tolist() for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, fields):
+        return cls(np.array(fields['column'], dtype=np.intp), np.array(fields['title'], dtype=object),
+                   *(np.array(fields[field], dtype=float) for field in ('first_mean', 'second_mean', 'difference')),
+                   np.array(fields['good'], dtype=bool), np.array(fields['column_mean'], dtype=float))
+
+
+class PairSheet:
+
+    def __init__(self, title, pairs):
+        self.title = title
+        self.pairs = pairs
+
+    def iter_rows(self):
+        for k, v in self.pairs:
+            yield [k, v]
+
+
+class RowRangeSum:
+    # RUNNING COLUMN SUM OF THE SHEET ROWS first_row TO stop_row (EXCLUDED), FED CHUNK BY CHUNK IN SHEET ORDER.
+    # WITH keep_rows THE ROWS THEMSELVES ARE ALSO KEPT, FOR SHORT RANGES ONLY.
+
+    def __init__(self, first_row, stop_row, keep_rows=False):
+        self.first_row = first_row
+        self.stop_row = stop_row
+        self.total = None
+        self.count = 0
+        self.rows = [] if keep_rows else None
+
+    def add(self, values, values_first_row):
+        start = max(self.first_row - values_first_row, 0)
+        stop = min(self.stop_row - values_first_row, len(values))
+        if self.total is None:
+            self.total = np.zeros(values.shape[1])
+        if start < stop:
+            ExcelFilter.sum_rows(values[start:stop], self.total)
+            self.count += stop - start
+            if self.rows is not None:
+                self.rows.append(values[start:stop].copy())
+
+    def is_complete(self):
+        return self.count == self.stop_row - self.first_row and self.count > 0
+
+    def mean(self):
+        return self.total / self.count
+
+    def stacked_rows(self):
+        return np.concatenate(self.rows)
+
+
+class Constant:
+    STARS = "******************************************************"
+    XLS = ".xls"
+    XLSX = ".xlsx"
+    CSV = ".csv"
+    PARQUET = ".parquet"
+    ARROW = ".arrow"
+    FEATHER = ".feather"
+    EXCEL_EXTENSIONS = (XLS, XLSX)
+    DATA_EXTENSIONS = (CSV, PARQUET, ARROW, FEATHER)
+    XLSX_FORMAT = "xlsx"
+    CSV_FORMAT = "csv"
+    PARQUET_FORMAT = "parquet"
+    ARROW_FORMAT = "arrow"
+    OUTPUT_FORMATS = (XLSX_FORMAT, CSV_FORMAT, PARQUET_FORMAT, ARROW_FORMAT)
+    THRESHOLD = "threshold-"
+    THRESHOLD_SWEEP = "threshold-sweep"
+    TXT = ".txt"
+    SHEET_BACKGROUND_SUBTRACTED = "bg_subtracted"
+    SHEET_GOOD_ROI = "good ROI"
+    SHEET_WRONG_ROI = "wrong ROI"
+    MEAN_GOOD_ROI = "mean good ROI"
+    MEAN_WRONG_ROI = "mean wrong ROI"
+    MEAN_MIN_ROW = 22
+    MEAN_MAX_ROW = 41
+    CACHE_VERSION = 2
+    CACHE_MAX_BYTES = 2 ** 30
+    CACHE_METADATA = "metadata.pkl"
+    HASH_CHUNK_SIZE = 2 ** 20
+    RESULT_ABOVE = "result above"
+    RESULT_BELOW = "result below"
+    SHEET_SWEEP_SUMMARY = "threshold sweep"
+    SHEET_SWEEP_MEMBERSHIP = "good ROI by threshold"
+    # SHEET ROW AND COLUMN NUMBERS START AT 1: ROW 1 HOLDS THE TITLES, COLUMN 1 THE TIME INDEX
+    DATA_MIN_ROW = 2
+    DATA_MIN_COL = 2
+    BACKGROUND_COLUMN_INDEX = 2
+    FILTER_MAX_ROW = 41
+    ROW_BUFFER_SIZE = 1024
+    CANCEL_POLL_SECONDS = 0.2
+    STAGE_OPEN = "open"
+    STAGE_BACKGROUND = "background"
+    STAGE_FILTER = "filter"
+    STAGE_NORMALIZE = "normalize"
+    STAGE_SAVE = "save"
+    STAGE_DONE = "done"
+    WATCH_LEDGER = ".excel_filter_processed.jsonl"
+    INCREMENTAL_STATE = ".excel_filter_state.json"
+    INCREMENTAL_VERSION = 2
+    STATISTIC_MEAN = "mean"
+    STATISTIC_MEDIAN = "median"
+    STATISTIC_STD = "std"
+    STATISTIC_TRIMMED_MEAN = "trimmed_mean"
+    STATISTICS = (STATISTIC_MEAN, STATISTIC_MEDIAN, STATISTIC_STD, STATISTIC_TRIMMED_MEAN)
+    # SHARE OF THE RANGE ROWS CUT AT EACH END FOR THE TRIMMED MEAN
+    TRIM_PROPORTION = 0.1
+    SERVER_PORT = 8765
+    SERVER_WORKERS = 2
+    SERVER_MAX_QUEUE = 32
+    SERVER_FINISHED_JOBS = 1000
+    WATCH_POLL_SECONDS = 2.0
+    WATCH_STATS_SECONDS = 60.0
+    PARALLEL_MIN_COLUMNS = 1000
+    PROBE_MAX_ERRORS = 5
+    # ~~ FILTER_MAX_COL is set automatically below before filtering
+
+
+# INPUT CHECKS SHARED BY THE GUI AND THE COMMAND LINE, EACH ONE RETURNS AN ERROR MESSAGE OR None
+def validate_threshold(threshold):
+    try:
+        if not (0 <= int(threshold) <= 100):
+            raise ValueError
+        else:
+            logging.info('threshold is valid: {}'.format(threshold))
+    except ValueError:
+        msg = 'Threshold value should be a number between 0 and 100, current value: {}'.format(threshold)
+        logging.error(msg)
+        return msg
+
+
+def validate_first_range(first_range_from, first_range_to):
+    try:
+        if int(first_range_from) > int(first_range_to):
+            return 'First range error: {} is greater than {}!'.format(first_range_from, first_range_to)
+        if int(first_range_from) == int(first_range_to):
+            return 'First range error: there is no valid interval!'
+        if int(first_range_from) == 1:
+            return 'First range error: row 1 is column title!'
+    except ValueError:
+        msg = 'First range not valid numbers'
+        logging.error(msg)
+        return msg
+
+
+def validate_second_range(second_range_from, second_range_to, first_range_to):
+    try:
+        if int(second_range_from) > int(second_range_to):
+            return 'Second range error: {} is greater than {}!'.format(second_range_from, second_range_to)
+        if int(second_range_from) == int(second_range_to):
+            return 'Second range error: there is not interval!'
+        if int(second_range_from) <= int(first_range_to):
+            return 'Error: first range is greater than second row!'
+    except ValueError:
+        msg = 'Second range not valid numbers'
+        logging.error(msg)
+        return msg
+
+
+def validate_mean_range(mean_range_from, mean_range_to):
+    try:
+        if int(mean_range_from) >= int(mean_range_to):
+            return 'Mean range error: {} is not lower than {}!'.format(mean_range_from, mean_range_to)
+        if int(mean_range_from) == 1:
+            return 'Mean range error: row 1 is column title!'
+    except ValueError:
+        msg = 'Mean range not valid numbers'
+        logging.error(msg)
+        return msg
+
+
+def validate_excel_file_path(filename):
+    if not os.path.isfile(filename):
+        logging.info('Error looking for excel file: {}'.format(filename))
+        return 'Excel file not found, drag again!'
+    else:
+        logging.info('Excel file found: {}'.format(filename))
+
+
+def validate_watch_directory(directory):
+    if not os.path.isdir(directory):
+        logging.info('Error looking for directory: {}'.format(directory))
+        return 'Directory to watch not found: {}'.format(directory)
+
+
+def validate_excel_file_content(filename, first_range, second_range, mean_range=None, skip_normalization=False):
+    # READS ONLY THE TOP ROWS OF AN XLSX FILE, RETURNS A LIST OF ERROR MESSAGES
+    import probe
+    errors = probe.validate_workbook(filename, first_range, second_range, mean_range, skip_normalization)
+    for error in errors:
+        logging.error('{}: {}'.format(filename, error))
+    return errors
+
+
+def validate_inputs(filename, threshold, first_range, second_range, mean_range=None, watch=False):
+    errors = [validate_threshold(threshold) if threshold is not None else None,
+              validate_first_range(first_range[0], first_range[1]),
+              validate_second_range(second_range[0], second_range[1], first_range[1]),
+              validate_watch_directory(filename) if watch else validate_excel_file_path(filename)]
+    if mean_range is not None:
+        errors.append(validate_mean_range(mean_range[0], mean_range[1]))
+    return [error for error in errors if error is not None]
@@ -0,0 +1,285 @@
+import logging
+import threading
+
+from kivy.app import App
+from kivy.clock import Clock
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.button import Button
+from kivy.core.window import Window
+from kivy.uix.label import Label
+from kivy.uix.textinput import TextInput
+from kivy.uix.checkbox import CheckBox
+from kivy.uix.popup import Popup
+
+from excel_filter import ExcelFilter, ProcessingCancelled, validate_excel_file_content, validate_inputs
+
+
+class MyGrid(GridLayout):
+    first_row_value = None
+    skip_bg_subtraction = False
+    skip_normalization = False
+    threshold = 0
+    first_range_from = 0
+    first_range_to = 0
+    second_range_from = 0
+    second_range_to = 0
+    filename = ''
+    excel_processor = None
+    cancel_event = None
+
+    def __init__(self, **kwargs):
+        super(MyGrid, self).__init__(**kwargs)
+
+        self.excel_processor = ExcelFilter()
+
+        self.cols = 1
+        self.row_default_height = '300dp'
+        self.row_force_default = True
+        self.rows = 2
+
+        top_layout = GridLayout(cols=2, row_force_default=True, row_default_height='40dp')
+        top_layout.add_widget(Label(text="Threshold", size_hint_x=None, height='20dp', width='200dp'))
+        threshold_input = TextInput(text='', font_size=40, height='20dp', multiline=False, write_tab=False)
+        threshold_input.bind(text=self.on_threshold)
+        top_layout.add_widget(threshold_input)
+
+        top_layout.add_widget(Label(text="First range (row number)", size_hint_x=None, height='200dp', width='200dp'))
+        first_range_layout = GridLayout(cols=4, row_force_default=True, row_default_height='40dp')
+        first_range_layout.add_widget(Label(text="from", size_hint_x=None, height='20dp'))
+        first_range_from = TextInput(font_size=40, height='20dp', multiline=False, write_tab=False)
+        first_range_from.bind(text=self.on_first_range_from)
+        first_range_layout.add_widget(first_range_from)
+        first_range_layout.add_widget(Label(text="to", size_hint_x=None, height='20dp'))
+        first_range_to = TextInput(font_size=40, height='20dp', multiline=False, write_tab=False)
+        first_range_to.bind(text=self.on_first_range_to)
+        first_range_layout.add_widget(first_range_to)
+        top_layout.add_widget(first_range_layout)
+
+        top_layout.add_widget(Label(text="Second range (row number)", size_hint_x=None, height='20dp', width='200dp'))
+        second_range_layout = GridLayout(cols=4, row_force_default=True, row_default_height='40dp')
+        second_range_layout.add_widget(Label(text="from", size_hint_x=None, height='20dp'))
+        second_range_from = TextInput(font_size=40, height='20dp', multiline=False, write_tab=False)
+        second_range_from.bind(text=self.on_second_range_from)
+        second_range_layout.add_widget(second_range_from)
+        second_range_layout.add_widget(Label(text="to", size_hint_x=None, height='20dp'))
+        second_range_to = TextInput(font_size=40, height='20dp', multiline=False, write_tab=False)
+        second_range_to.bind(text=self.on_second_range_to)
+        second_range_layout.add_widget(second_range_to)
+        top_layout.add_widget(second_range_layout)
+
+        top_layout.add_widget(Label(text="Skip background subtraction", size_hint_x=None, height='20dp', width='200dp'))
+        bg_subtraction = CheckBox(active=False)
+        bg_subtraction.bind(active=self.bg_subtraction_active)
+        top_layout.add_widget(bg_subtraction)
+
+        top_layout.add_widget(Label(text="Skip normalization", size_hint_x=None, height='20dp', width='200dp'))
+        bg_subtraction = CheckBox(active=False)
+        bg_subtraction.bind(active=self.normalization_active)
+        top_layout.add_widget(bg_subtraction)
+
+        top_layout.add_widget(Label(text="File location", size_hint_x=None, height='20dp', width='200dp'))
+        self.dragged_file = Label(text='')
+        self.dragged_file.font_size = '12dp'
+        top_layout.add_widget(self.dragged_file)
+
+        top_layout.add_widget(Label(text="Progress", size_hint_x=None, height='20dp', width='200dp'))
+        self.progress_label = Label(text='')
+        self.progress_label.font_size = '12dp'
+        top_layout.add_widget(self.progress_label)
+
+        self.add_widget(top_layout)
+
+        bottom_layout = GridLayout(cols=3, row_force_default=True, row_default_height='20dp')
+        self.process_btn = Button(text="No file to process",
+                                  font_size="20sp",
+                                  background_color=(0, 2, 3, 1),
+                                  color=(1, 1, 1, 1),
+                                  size=(32, 32),
+                                  size_hint=(.2, .2),
+                                  pos=(300, 250),
+                                  disabled=True)
+        self.process_btn.bind(on_press=self.on_press)
+        bottom_layout.add_widget(self.process_btn)
+
+        self.cancel_btn = Button(text="Cancel",
+                                 font_size="20sp",
+                                 background_color=(1, .6, 0, .85),
+                                 color=(1, 1, 1, 1),
+                                 size=(32, 32),
+                                 size_hint=(.2, .2),
+                                 pos=(300, 250),
+                                 disabled=True)
+        self.cancel_btn.bind(on_press=self.on_cancel)
+        bottom_layout.add_widget(self.cancel_btn)
+
+        self.clear_btn = Button(text="Clear file",
+                                font_size="20sp",
+                                background_color=(1, .3, .4, .85),
+                                color=(1, 1, 1, 1),
+                                size=(32, 32),
+                                size_hint=(.2, .2),
+                                pos=(300, 250),
+                                disabled=True)
+
+        self.clear_btn.bind(on_press=self.on_clear)
+        bottom_layout.add_widget(self.clear_btn)
+
+        self.add_widget(bottom_layout)
+
+        Window.clearcolor = (.46, .49, .49, 1)
+        Window.bind(on_dropfile=self.on_file_drop)
+
+    def on_press(self, instance):
+        self.validate_inputs()
+
+    def on_cancel(self, instance):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_btn.disabled = True
+            self.progress_label.text = 'cancelling...'
+
+    def on_clear(self, instance):
+        self.dragged_file.text = ''
+        self.process_btn.disabled = True
+        self.clear_btn.disabled = True
+        self.process_btn.text = 'No file to process'
+        self.filename = self.dragged_file.text
+        logging.info('file: {}'.format(self.filename))
+
+    def on_threshold(self, instance, value):
+        self.threshold = value
+        logging.info('threshold: ' + self.threshold)
+
+    def on_first_range_from(self, instance, value):
+        self.first_range_from = value
+        logging.info('first_range_from: ' + self.first_range_from)
+
+    def on_first_range_to(self, instance, value):
+        self.first_range_to = value
+        logging.info('first_range_to: ' + self.first_range_to)
+
+    def on_second_range_from(self, instance, value):
+        self.second_range_from = value
+        logging.info('second_range_from: ' + self.second_range_from)
+
+    def on_second_range_to(self, instance, value):
+        self.second_range_to = value
+        logging.info('second_range_to: ' + self.second_range_to)
+
+    def on_file_drop(self, window, file_path):
+        self.dragged_file.text = r'{}'.format(file_path.decode('utf-8'))
+        self.process_btn.disabled = False
+        self.clear_btn.disabled = False
+        self.process_btn.text = 'Process the file'
+        self.filename = self.dragged_file.text
+        logging.info('file: {}'.format(self.filename))
+
+    def bg_subtraction_active(self, checkboxInstance, isActive):
+        if isActive:
+            self.skip_bg_subtraction = True
+        else:
+            self.skip_bg_subtraction = False
+        logging.info('skip bg subtraction: ' + str(self.skip_bg_subtraction))
+
+    def normalization_active(self, checkboxInstance, isActive):
+        if isActive:
+            self.skip_normalization = True
+        else:
+            self.skip_normalization = False
+        logging.info('skip bg subtraction: ' + str(self.skip_normalization))
+
+    def validate_inputs(self):
+        first_range = [self.first_range_from, self.first_range_to]
+        second_range = [self.second_range_from, self.second_range_to]
+        errors = validate_inputs(self.filename, self.threshold, first_range, second_range)
+        if not errors:
+            first_range = [int(self.first_range_from), int(self.first_range_to)]
+            second_range = [int(self.second_range_from), int(self.second_range_to)]
+            # BAD ROWS OR CELLS ARE REPORTED BEFORE THE WORKBOOK IS LOADED, FILES OF A LIST ARE CHECKED IN THE BATCH
+            errors = validate_excel_file_content(self.filename, first_range, second_range,
+                                                 self.excel_processor.mean_range, self.skip_normalization)
+        if errors:
+            self.display_error_popup(errors)
+        else:
+            self.start_processing(first_range, second_range)
+
+    def start_processing(self, first_range, second_range):
+        # PROCESSING RUNS IN A WORKER THREAD, EVERY WIDGET UPDATE IS SENT BACK TO THE UI THREAD WITH Clock
+        self.cancel_event = threading.Event()
+        self.excel_processor.cancel_event = self.cancel_event
+        self.excel_processor.progress_callback = self.on_progress
+        self.process_btn.disabled = True
+        self.clear_btn.disabled = True
+        self.cancel_btn.disabled = False
+        worker = threading.Thread(target=self.run_processing, args=(first_range, second_range), daemon=True)
+        worker.start()
+
+    def run_processing(self, first_range, second_range):
+        errors = []
+        cancelled = False
+        try:
+            results = self.excel_processor.process_excel_file(self.filename, int(self.threshold), first_range,
+                                                              second_range, self.skip_bg_subtraction,
+                                                              self.skip_normalization)
+            for result in results or []:
+                if result['error'] is not None:
+                    errors.append('{}: {}'.format(result['file'], result['error']))
+        except ProcessingCancelled:
+            cancelled = True
+        # subtract_background EXITS ON A DUPLICATED BACKGROUND COLUMN, IT MUST NOT END THE THREAD SILENTLY
+        except (Exception, SystemExit) as e:
+            errors.append(str(e))
+        Clock.schedule_once(lambda dt: self.on_processing_finished(errors, cancelled))
+
+    def on_progress(self, stage, file_number, file_count):
+        text = 'file {}/{}: {}'.format(file_number, file_count, stage)
+        Clock.schedule_once(lambda dt: setattr(self.progress_label, 'text', text))
+
+    def on_processing_finished(self, errors, cancelled):
+        self.cancel_event = None
+        self.process_btn.disabled = False
+        self.clear_btn.disabled = False
+        self.cancel_btn.disabled = True
+        if cancelled:
+            self.progress_label.text = 'cancelled'
+        elif errors:
+            self.progress_label.text = 'failed'
+            self.display_error_popup(errors)
+        else:
+            self.progress_label.text = 'done'
+            self.display_done_popup()
+
+    @staticmethod
+    def display_error_popup(errors):
+        layout = GridLayout(cols=1, padding=10)
+
+        for e in errors:
+            popup_label = Label(text=e)
+            layout.add_widget(popup_label)
+        close_button = Button(text="Close the pop-up")
+        layout.add_widget(close_button)
+        popup = Popup(title='Error',
+                      content=layout,
+                      size_hint=(None, None), size=('700dp', '300dp'))
+        popup.open()
+        close_button.bind(on_press=popup.dismiss)
+
+    @staticmethod
+    def display_done_popup():
+        layout = GridLayout(cols=1, padding=10)
+
+        popup_label = Label(text='DONE!')
+        layout.add_widget(popup_label)
+        close_button = Button(text="Close the pop-up")
+        layout.add_widget(close_button)
+        popup = Popup(title='All done',
+                      content=layout,
+                      size_hint=(None, None), size=('700dp', '200dp'))
+        popup.open()
+        close_button.bind(on_press=popup.dismiss)
+
+
+class FilterExcelProgram(App):
+    def build(self):
+        return MyGrid()
+
@@ -0,0 +1,76 @@
+import cProfile
+import json
+import os
+import resource
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+
+
+class StageRecorder:
+    # PER FILE REPORT OF THE PIPELINE STAGES, APPENDED AS ONE JSON LINE TO report_file. EVERY STAGE RECORDS WALL AND
+    # CPU TIME, THE ROWS AND COLUMNS IT PROCESSED AND THE PROCESS MAX RSS (ONE getrusage CALL). PEAK PYTHON/NUMPY
+    # ALLOCATION PER STAGE NEEDS trace_memory, WHICH SLOWS OPENPYXL DOWN NOTICEABLY. WITH profile_directory EACH
+    # FILE IS ALSO RUN UNDER cProfile AND ITS STATS ARE DUMPED THERE (pstats / snakeviz FORMAT).
+
+    def __init__(self, report_file, profile_directory=None, trace_memory=False):
+        self.report_file = report_file
+        self.profile_directory = profile_directory
+        self.trace_memory = trace_memory
+        self.report = None
+
+    @contextmanager
+    def file(self, excel_file):
+        self.report = {'file': excel_file, 'started': time.strftime('%Y-%m-%dT%H:%M:%S'), 'output': None,
+                       'error': None, 'stages': []}
+        profiler = None
+        if self.profile_directory is not None:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield self.report
+        except BaseException as e:
+            self.report['error'] = str(e) or type(e).__name__
+            raise
+        finally:
+            self.report['wall_seconds'] = time.perf_counter() - start
+            if self.trace_memory:
+                tracemalloc.stop()
+            if profiler is not None:
+                profiler.disable()
+                os.makedirs(self.profile_directory, exist_ok=True)
+                profile_file = os.path.join(self.profile_directory, '{}_{}.prof'.format(
+                    os.path.splitext(os.path.basename(excel_file))[0], time.strftime('%Y-%m-%d-%H-%M-%S')))
+                profiler.dump_stats(profile_file)
+                self.report['profile'] = profile_file
+            self.write(self.report)
+            self.report = None
+
+    @contextmanager
+    def stage(self, name, shape):
+        # shape() IS CALLED AFTER THE STAGE AND RETURNS THE (ROWS, COLUMNS) IT WORKED ON
+        if self.report is None:
+            yield
+            return
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        yield
+        record = {'stage': name, 'wall_seconds': time.perf_counter() - start_wall,
+                  'cpu_seconds': time.process_time() - start_cpu}
+        record['rows'], record['columns'] = shape()
+        # ru_maxrss IS IN KILOBYTES ON LINUX
+        record['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        if self.trace_memory:
+            record['peak_alloc_bytes'] = tracemalloc.get_traced_memory()[1]
+        self.report['stages'].append(record)
+
+    def write(self, report):
+        # ONE write() CALL PER LINE IN APPEND MODE, SO WORKERS OF A BATCH CAN SHARE THE SAME REPORT FILE
+        with open(self.report_file, 'a') as fp:
+            fp.write(json.dumps(report, default=str) + '\n')
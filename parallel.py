@@ -0,0 +1,129 @@
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from excel_filter import Constant, ExcelFilter, RoiSheet
+
+# MULTI-CORE SCORING AND NORMALIZATION OF ONE WIDE SHEET: THE NUMERIC BLOCK IS COPIED ONCE INTO SHARED MEMORY AND
+# EVERY WORKER PROCESS READS ITS OWN RANGE OF COLUMNS FROM IT, NOTHING BUT THE BLOCK NAME AND THE COLUMN BOUNDS IS
+# SENT TO THE WORKERS. EVERY COLUMN IS COMPUTED BY THE SAME CODE AS THE SERIAL PATH, THE RESULTS ARE IDENTICAL.
+
+
+class SharedBlock:
+    # 2-D FLOAT ARRAY IN A NAMED SHARED MEMORY SEGMENT, CREATED BY THE PARENT AND ATTACHED BY THE WORKERS
+
+    def __init__(self, memory, shape, owner):
+        self.memory = memory
+        self.shape = shape
+        self.owner = owner
+        self.array = np.ndarray(shape, dtype=np.float64, buffer=memory.buf)
+
+    @classmethod
+    def create(cls, shape):
+        # A SEGMENT CANNOT BE EMPTY
+        size = max(int(np.prod(shape)) * np.dtype(np.float64).itemsize, 1)
+        return cls(shared_memory.SharedMemory(create=True, size=size), shape, True)
+
+    @classmethod
+    def copy_of(cls, values):
+        block = cls.create(values.shape)
+        block.array[...] = values
+        return block
+
+    @classmethod
+    def attach(cls, descriptor):
+        name, shape = descriptor
+        # THE WORKERS SHARE THE RESOURCE TRACKER OF THE PARENT, ONLY THE PARENT UNLINKS THE SEGMENT
+        return cls(shared_memory.SharedMemory(name=name), shape, False)
+
+    def descriptor(self):
+        return self.memory.name, self.shape
+
+    def close(self):
+        # VIEWS ON THE BUFFER MUST BE GONE BEFORE THE SEGMENT IS CLOSED
+        self.array = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class ColumnScorer:
+    # ONE POOL PER FILE, THE BLOCK OF THE FILTERED SHEET IS SHARED ONCE FOR THE SCORING AND THE NORMALIZATION
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = None
+        self.values = None
+        self.block = None
+
+    def share(self, values):
+        if self.values is not values:
+            self.release_block()
+            self.block = SharedBlock.copy_of(values)
+            self.values = values
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.block
+
+    def column_bounds(self, column_count):
+        # CONTIGUOUS COLUMN RANGES OF ALMOST EQUAL WIDTH, ONE PER WORKER
+        edges = np.linspace(0, column_count, min(self.workers, max(column_count, 1)) + 1).astype(int)
+        return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:])]
+
+    def range_statistics(self, values, row_bounds):
+        block = self.share(values)
+        bounds = self.column_bounds(values.shape[1])
+        parts = list(self.executor.map(score_columns, [block.descriptor()] * len(bounds), bounds,
+                                       [row_bounds] * len(bounds)))
+        return tuple({statistic: np.concatenate([part[number][statistic] for part in parts])
+                      for statistic in Constant.STATISTICS} for number in range(len(row_bounds)))
+
+    def normalized_selections(self, sheet, means, selections):
+        # THE SHARED BLOCK IS NORMALIZED IN PLACE AND THE (columns, title) SELECTIONS ARE GATHERED FROM IT, AS
+        # ExcelFilter.normalize AND select_columns DO ON ONE CORE. THE BLOCK NO LONGER HOLDS THE SHEET VALUES AFTER
+        # THAT, IT IS RELEASED.
+        block = self.share(sheet.values)
+        normalized = None
+        try:
+            titled = sheet.titled_columns()
+            bounds = self.column_bounds(sheet.values.shape[1])
+            list(self.executor.map(normalize_columns, [block.descriptor()] * len(bounds), bounds,
+                                   [means[start:stop] for start, stop in bounds],
+                                   [titled[start:stop] for start, stop in bounds]))
+            normalized = RoiSheet(None, sheet.index_title, sheet.index, sheet.titles, block.array)
+            sheets = [normalized.select_columns(columns, title) for columns, title in selections]
+        finally:
+            # THE VIEW ON THE SEGMENT MUST BE GONE BEFORE IT IS CLOSED
+            normalized = None
+            self.release_block()
+        return sheets
+
+    def release_block(self):
+        if self.block is not None:
+            self.block.close()
+        self.block = None
+        self.values = None
+
+    def close(self):
+        self.release_block()
+        if self.executor is not None:
+            self.executor.shutdown()
+        self.executor = None
+
+
+def score_columns(descriptor, bounds, row_bounds):
+    block = SharedBlock.attach(descriptor)
+    try:
+        return [ExcelFilter.calculate_range_statistics(block.array[start:stop, bounds[0]:bounds[1]])
+                for start, stop in row_bounds]
+    finally:
+        block.close()
+
+
+def normalize_columns(descriptor, bounds, means, titled):
+    block = SharedBlock.attach(descriptor)
+    try:
+        ExcelFilter.normalize_columns(block.array[:, bounds[0]:bounds[1]], means, titled)
+    finally:
+        block.close()
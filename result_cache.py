@@ -0,0 +1,86 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
+from excel_filter import Constant
+
+
+class ResultCache:
+    # ON-DISK CACHE OF INTERMEDIATE ARRAYS, ONE DIRECTORY PER KEY HOLDING A .npy FILE PER ARRAY AND A PICKLED
+    # METADATA FILE. THE KEY IS THE SHA-256 OF THE INPUT FILE CONTENT AND OF THE PARAMETERS THE ARRAYS DEPEND ON.
+    # ENTRIES ARE EVICTED LEAST RECENTLY USED FIRST (DIRECTORY MTIME, TOUCHED ON EVERY HIT) ABOVE max_bytes.
+
+    def __init__(self, directory, max_bytes=Constant.CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, file, parameters):
+        return content_key(file, [Constant.CACHE_VERSION, parameters])
+
+    def load(self, key):
+        entry = os.path.join(self.directory, key)
+        if not os.path.isdir(entry):
+            return None
+        try:
+            with open(os.path.join(entry, Constant.CACHE_METADATA), 'rb') as fp:
+                metadata = pickle.load(fp)
+            arrays = {name: np.load(os.path.join(entry, name + '.npy'), mmap_mode='r')
+                      for name in metadata['arrays']}
+        except (OSError, ValueError, pickle.UnpicklingError, KeyError, EOFError):
+            logging.warning("cache entry {} is unreadable, ignoring it...".format(key))
+            return None
+        os.utime(entry)
+        logging.info("cache hit: {}...".format(key))
+        return arrays, metadata['metadata']
+
+    def store(self, key, arrays, metadata):
+        entry = os.path.join(self.directory, key)
+        if os.path.isdir(entry):
+            return
+        # WRITTEN IN A TEMPORARY DIRECTORY AND RENAMED, SO A CONCURRENT RUN NEVER SEES A HALF WRITTEN ENTRY
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.directory)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(staging, name + '.npy'), np.ascontiguousarray(array))
+            with open(os.path.join(staging, Constant.CACHE_METADATA), 'wb') as fp:
+                pickle.dump({'arrays': list(arrays), 'metadata': metadata}, fp)
+            os.rename(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(entry):
+                raise
+        logging.info("cache store: {}...".format(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            if name.startswith('.') or not os.path.isdir(entry):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry))
+            entries.append((os.path.getmtime(entry), size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logging.info("cache evict: {}...".format(os.path.basename(entry)))
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+
+def content_key(file, parameters):
+    # SHA-256 OF THE FILE CONTENT AND OF THE JSON OF parameters
+    digest = hashlib.sha256()
+    with open(file, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(Constant.HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    digest.update(json.dumps(parameters, sort_keys=True).encode())
+    return digest.hexdigest()
@@ -0,0 +1,266 @@
+#!/usr/bin/python3
+
+# LOCAL JOB SERVER: SCRIPTS AND NOTEBOOKS SUBMIT FILES OVER HTTP (TCP OR UNIX SOCKET) WITHOUT PAYING THE NUMPY AND
+# OPENPYXL IMPORTS, WHICH ARE DONE ONCE BY THE WARM PROCESS POOL. JSON IN, JSON OUT:
+#   POST   /jobs       {"file": ..., "threshold": 10, "first_range": [2, 10], "second_range": [20, 30],
+#                       optional "skip_background", "skip_normalization", "mean_range", "streaming",
+#                       "output_format", "chunk_rows", "incremental", "statistic"}
+#                       -> 202 {"id": ..., "status": "queued"}
+#                       400 ON INVALID PARAMETERS, 503 WHEN THE QUEUE IS FULL (RETRY LATER)
+#   GET    /jobs/<id>  -> {"id", "status": queued|running|done|failed|cancelled, "result": {good, wrong, output...}}
+#   GET    /jobs       -> EVERY KNOWN JOB
+#   DELETE /jobs/<id>  -> CANCELS A JOB STILL QUEUED
+#   GET    /stats      -> QUEUE DEPTH, RUNNING JOBS AND COUNTERS
+# usage: python3 server.py [--port 8765 | --unix /tmp/excel_filter.sock] [--workers 2] [--max-queue 32]
+#   curl -s -X POST localhost:8765/jobs -d '{"file": "/data/a.xlsx", "threshold": 10, "first_range": [2, 10],
+#        "second_range": [20, 30]}'
+
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import signal
+import sys
+import time
+import uuid
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from excel_filter import Constant, ExcelFilter, process_batch_entry, validate_inputs
+
+JOB_OPTIONS = ('streaming', 'output_format', 'chunk_rows', 'incremental', 'statistic')
+HTTP_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                409: 'Conflict', 503: 'Service Unavailable'}
+
+
+class JobServer:
+    # AT MOST workers JOBS RUN AT THE SAME TIME, AT MOST max_queue WAIT. BEYOND THAT A SUBMISSION IS REFUSED (503)
+    # INSTEAD OF PILING UP: THE CLIENT DECIDES WHEN TO RETRY. FINISHED JOBS ARE KEPT FOR POLLING, THE OLDEST ARE
+    # FORGOTTEN ABOVE Constant.SERVER_FINISHED_JOBS.
+
+    def __init__(self, workers=Constant.SERVER_WORKERS, max_queue=Constant.SERVER_MAX_QUEUE, cache=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.cache = cache
+        self.jobs = collections.OrderedDict()
+        self.queue = None
+        self.executor = None
+        self.counters = {'submitted': 0, 'rejected': 0, 'done': 0, 'failed': 0, 'cancelled': 0}
+
+    async def serve(self, host=None, port=None, unix_path=None):
+        self.queue = asyncio.Queue(self.max_queue)
+        self.executor = self.start_executor()
+        runners = [asyncio.ensure_future(self.run_jobs()) for _ in range(self.workers)]
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, unix_path)
+            logging.info("job server listening on '{}' with {} worker(s)...".format(unix_path, self.workers))
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            logging.info("job server listening on {}:{} with {} worker(s)...".format(host, port, self.workers))
+        stop = asyncio.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(signal_number, stop.set)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            logging.info("stopping the job server...")
+            for runner in runners:
+                runner.cancel()
+            self.executor.shutdown(cancel_futures=True)
+
+    def start_executor(self):
+        # THE POOL ONLY STARTS A PROCESS WHEN A TASK IS SUBMITTED: ONE EMPTY TASK PER WORKER STARTS THEM ALL NOW, SO
+        # warm_up RUNS BEFORE THE FIRST JOB AND NOT DURING IT
+        executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+        for _ in range(self.workers):
+            executor.submit(int)
+        return executor
+
+    def submit(self, request):
+        errors = self.check_request(request)
+        if errors:
+            return 400, {'errors': errors}
+        if self.queue.full():
+            self.counters['rejected'] += 1
+            return 503, {'errors': ['queue full ({} jobs waiting), retry later'.format(self.queue.qsize())]}
+        excel_filter = ExcelFilter(cache=self.cache, **{option: request[option] for option in JOB_OPTIONS
+                                                          if option in request})
+        excel_filter.set_parameters(int(request['threshold']), [int(row) for row in request['first_range']],
+                                    [int(row) for row in request['second_range']],
+                                    bool(request.get('skip_background', False)),
+                                    bool(request.get('skip_normalization', False)),
+                                    [int(row) for row in request['mean_range']] if 'mean_range' in request else None)
+        job = {'id': uuid.uuid4().hex, 'status': 'queued', 'file': request['file'], 'submitted': time.time(),
+               'started': None, 'finished': None, 'result': None}
+        self.jobs[job['id']] = job
+        self.queue.put_nowait((job, excel_filter.batch_parameters()))
+        self.counters['submitted'] += 1
+        self.forget_finished_jobs()
+        return 202, self.describe(job)
+
+    @staticmethod
+    def check_request(request):
+        if not isinstance(request, dict):
+            return ['the request body should be a JSON object']
+        missing = [key for key in ('file', 'threshold', 'first_range', 'second_range') if key not in request]
+        if missing:
+            return ['missing: {}'.format(', '.join(missing))]
+        ranges = [request['first_range'], request['second_range']] + \
+            ([request['mean_range']] if 'mean_range' in request else [])
+        if not all(isinstance(rows, list) and len(rows) == 2 for rows in ranges):
+            return ['ranges should be [FROM, TO] lists']
+        errors = validate_inputs(request['file'], request['threshold'], request['first_range'],
+                                 request['second_range'], request.get('mean_range'))
+        if request.get('output_format', Constant.XLSX_FORMAT) not in Constant.OUTPUT_FORMATS:
+            errors.append('output_format should be one of: {}'.format(', '.join(Constant.OUTPUT_FORMATS)))
+        if request.get('statistic', Constant.STATISTIC_MEAN) not in Constant.STATISTICS:
+            errors.append('statistic should be one of: {}'.format(', '.join(Constant.STATISTICS)))
+        chunk_rows = request.get('chunk_rows')
+        if chunk_rows is not None and (isinstance(chunk_rows, bool) or not isinstance(chunk_rows, int) or
+                                       chunk_rows < 1):
+            errors.append('chunk_rows should be a positive number of rows')
+        return errors
+
+    async def run_jobs(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job, parameters = await self.queue.get()
+            if job['status'] == 'cancelled':
+                continue
+            job['status'] = 'running'
+            job['started'] = time.time()
+            executor = self.executor
+            try:
+                result = await loop.run_in_executor(executor, process_batch_entry, job['file'], parameters)
+            except Exception as e:
+                # A WORKER THAT DIED (BrokenProcessPool) FAILS ITS JOB, NOT THE SERVER. THE FIRST RUNNER TO SEE THE
+                # BROKEN POOL STARTS A NEW ONE FOR THE NEXT JOBS
+                if isinstance(e, BrokenProcessPool) and self.executor is executor:
+                    logging.warning("a worker died, starting a new pool...")
+                    executor.shutdown(wait=False)
+                    self.executor = self.start_executor()
+                result = {'file': job['file'], 'seconds': time.time() - job['started'], 'good': 0, 'wrong': 0,
+                          'output': None, 'error': str(e) or type(e).__name__, 'results': None}
+            job['finished'] = time.time()
+            job['result'] = result
+            job['status'] = 'done' if result['error'] is None else 'failed'
+            self.counters[job['status']] += 1
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return 404, {'errors': ['unknown job: {}'.format(job_id)]}
+        if job['status'] != 'queued':
+            return 409, {'errors': ['job is {}, only queued jobs can be cancelled'.format(job['status'])]}
+        # STILL IN THE QUEUE, run_jobs DROPS IT WHEN IT COMES OUT
+        job['status'] = 'cancelled'
+        job['finished'] = time.time()
+        self.counters['cancelled'] += 1
+        return 200, self.describe(job)
+
+    def forget_finished_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job['finished'] is not None]
+        for job_id in finished[:max(len(finished) - Constant.SERVER_FINISHED_JOBS, 0)]:
+            del self.jobs[job_id]
+
+    @staticmethod
+    def describe(job):
+        return dict(job)
+
+    def stats(self):
+        statuses = collections.Counter(job['status'] for job in self.jobs.values())
+        return dict(self.counters, queued=statuses['queued'], running=statuses['running'], workers=self.workers,
+                    max_queue=self.max_queue)
+
+    def route(self, method, path, body):
+        parts = [part for part in path.split('?')[0].split('/') if part]
+        if parts == ['stats'] and method == 'GET':
+            return 200, self.stats()
+        if parts == ['jobs'] and method == 'GET':
+            return 200, {'jobs': [self.describe(job) for job in self.jobs.values()]}
+        if parts == ['jobs'] and method == 'POST':
+            try:
+                request = json.loads(body or b'null')
+            except ValueError:
+                return 400, {'errors': ['the request body is not JSON']}
+            return self.submit(request)
+        if len(parts) == 2 and parts[0] == 'jobs':
+            if method == 'GET':
+                job = self.jobs.get(parts[1])
+                if job is None:
+                    return 404, {'errors': ['unknown job: {}'.format(parts[1])]}
+                return 200, self.describe(job)
+            if method == 'DELETE':
+                return self.cancel(parts[1])
+            return 405, {'errors': ['{} is not allowed on {}'.format(method, path)]}
+        return 404, {'errors': ['no route for {} {}'.format(method, path)]}
+
+    async def handle_connection(self, reader, writer):
+        # ONE REQUEST PER CONNECTION, HTTP/1.1 WITH Connection: close
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            if len(request_line) < 2:
+                status, content = 400, {'errors': ['bad request line']}
+            else:
+                status, content = self.route(request_line[0].upper(), request_line[1], body)
+        except (ValueError, TypeError, asyncio.IncompleteReadError) as e:
+            status, content = 400, {'errors': [str(e)]}
+        payload = json.dumps(content, default=str).encode()
+        writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n'
+                     'Connection: close\r\n\r\n'.format(status, HTTP_REASONS[status], len(payload)).encode()
+                     + payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+def warm_up():
+    # RUN ONCE PER POOL PROCESS: IMPORTS AND FIRST CALLS ARE PAID BEFORE THE FIRST JOB, CTRL+C ONLY STOPS THE SERVER
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import numpy as np
+    import openpyxl
+    openpyxl.Workbook(write_only=True)
+    np.zeros(1).sum()
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Local job server running ExcelFilter on a warm process pool.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=Constant.SERVER_PORT,
+                        help='TCP port (default: {})'.format(Constant.SERVER_PORT))
+    parser.add_argument('--unix', metavar='PATH', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=Constant.SERVER_WORKERS,
+                        help='jobs running at the same time (default: {})'.format(Constant.SERVER_WORKERS))
+    parser.add_argument('--max-queue', type=int, default=Constant.SERVER_MAX_QUEUE,
+                        help='jobs waiting before submissions are refused with 503 (default: {})'.format(
+                            Constant.SERVER_MAX_QUEUE))
+    parser.add_argument('--cache-dir', help='keep intermediate arrays in this directory (see cli.py --cache-dir)')
+    parser.add_argument('--cache-size', type=int, default=1024, help='cache size limit in MB (default: 1024)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    cache = None
+    if arguments.cache_dir is not None:
+        from result_cache import ResultCache
+        cache = ResultCache(arguments.cache_dir, arguments.cache_size * 2 ** 20)
+    job_server = JobServer(arguments.workers, arguments.max_queue, cache)
+    asyncio.run(job_server.serve(arguments.host, arguments.port, arguments.unix))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
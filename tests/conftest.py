@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from synthetic import generate_workbook
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    # 40 ROWS OF 12 ROI, A FIFTH OF THEM DRIFT AFTER ROW 15
+    path = str(tmp_path / 'recording.xlsx')
+    generate_workbook(path, 40, 12)
+    return path
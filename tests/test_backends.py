@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+import backends
+
+CSV_TEXT = 'Time,Background,ROI1,ROI2\n1,100,500.5,\n2,101,,502\n3,,503,503.25\n'
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / 'recording.csv'
+    path.write_text(CSV_TEXT)
+    return str(path)
+
+
+def test_csv_without_pyarrow(csv_file, monkeypatch):
+    monkeypatch.setattr(backends, 'pyarrow', None)
+    sheet = backends.read_sheet(csv_file)
+    assert sheet.title == 'recording'
+    assert sheet.index_title == 'Time' and sheet.index == [1, 2, 3]
+    assert sheet.titles == ['Background', 'ROI1', 'ROI2']
+    assert np.array_equal(sheet.values, [[100, 500.5, np.nan], [101, np.nan, 502], [np.nan, 503, 503.25]],
+                          equal_nan=True)
+
+
+def test_csv_same_with_and_without_pyarrow(csv_file, monkeypatch):
+    pytest.importorskip('pyarrow')
+    with_pyarrow = backends.read_sheet(csv_file)
+    monkeypatch.setattr(backends, 'pyarrow', None)
+    without_pyarrow = backends.read_sheet(csv_file)
+    assert with_pyarrow.index == without_pyarrow.index
+    assert with_pyarrow.titles == without_pyarrow.titles
+    assert np.array_equal(with_pyarrow.values, without_pyarrow.values, equal_nan=True)
@@ -0,0 +1,44 @@
+import glob
+import os
+import subprocess
+import sys
+
+import openpyxl
+
+from conftest import ROOT
+
+
+def run_cli(*arguments):
+    return subprocess.run([sys.executable, os.path.join(ROOT, 'cli.py')] + list(arguments), capture_output=True,
+                          text=True)
+
+
+def test_single_file(workbook):
+    completed = run_cli(workbook, '-t', '10', '--first-range', '2', '10', '--second-range', '20', '30')
+    assert completed.returncode == 0, completed.stderr
+    outputs = glob.glob(os.path.join(os.path.dirname(workbook), 'recording_threshold-10_*.xlsx'))
+    assert len(outputs) == 1
+    titles = openpyxl.load_workbook(outputs[0], read_only=True).sheetnames
+    assert {'good ROI', 'wrong ROI', 'good ROI normalized', 'wrong ROI normalized'} <= set(titles)
+
+
+def test_file_list(workbook, tmp_path):
+    file_list = tmp_path / 'files.txt'
+    file_list.write_text('{}\n{}\n'.format(workbook, tmp_path / 'missing.xlsx'))
+    completed = run_cli(str(file_list), '-t', '10', '--first-range', '2', '10', '--second-range', '20', '30')
+    # THE MISSING FILE FAILS, THE OTHER ONE IS STILL WRITTEN
+    assert completed.returncode == 1
+    assert len(glob.glob(str(tmp_path / 'recording_threshold-10_*.xlsx'))) == 1
+
+
+def test_bad_range(workbook):
+    completed = run_cli(workbook, '-t', '10', '--first-range', '10', '2', '--second-range', '20', '30')
+    assert completed.returncode == 2
+    assert 'greater than' in completed.stderr
+
+
+def test_select_outside_the_sweep(workbook):
+    completed = run_cli(workbook, '--sweep', '5:15:5', '--select', '10', '12', '--first-range', '2', '10',
+                        '--second-range', '20', '30')
+    assert completed.returncode == 2
+    assert '--select thresholds are not in --sweep: 12' in completed.stderr
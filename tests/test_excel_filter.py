@@ -0,0 +1,189 @@
+import csv
+import glob
+import os
+import shutil
+
+import numpy as np
+import openpyxl
+import pytest
+
+from excel_filter import ExcelFilter, RoiSheet
+from synthetic import generate_workbook
+
+
+def filtered(values, threshold=10, statistic=None):
+    excel_filter = ExcelFilter(statistic=statistic)
+    excel_filter.percentage_threshold = threshold
+    excel_filter.first_range = [2, 10]
+    excel_filter.second_range = [20, 30]
+    excel_filter.skip_background = True
+    excel_filter.source = RoiSheet('Data', 'Time', list(range(len(values))),
+                                   ['ROI{}'.format(i) for i in range(values.shape[1])], values)
+    excel_filter.filter_columns()
+    return excel_filter
+
+
+def test_empty_cell_in_filter_range_is_wrong():
+    values = np.full((40, 3), 100.0)
+    values[5, 1] = np.nan
+    values[5, 2] = np.nan
+    values[:, 2] *= np.where(np.arange(40) >= 15, 1.5, 1.0)
+    results = filtered(values).results
+    assert results.good.tolist() == [True, False, False]
+    assert np.isnan(results.difference[1:]).all()
+
+
+def test_empty_cell_with_zero_second_range_is_wrong():
+    values = np.full((40, 2), 100.0)
+    values[18:, 1] = 0.0
+    values[3, 1] = np.nan
+    assert filtered(values).results.good.tolist() == [True, False]
+
+
+def trim_mean(rows, proportion):
+    # AS scipy.stats.trim_mean: int(proportion * n) SORTED VALUES CUT AT EACH END
+    cut = int(proportion * len(rows))
+    return np.sort(rows, axis=0)[cut:len(rows) - cut].mean(axis=0)
+
+
+@pytest.mark.parametrize('row_count', [8, 9, 20])
+def test_range_statistics(row_count):
+    rows = np.random.default_rng(row_count).normal(1000.0, 50.0, (row_count, 5))
+    statistics = ExcelFilter.calculate_range_statistics(rows)
+    assert np.allclose(statistics['mean'], rows.mean(axis=0), rtol=1e-12, atol=0)
+    assert np.array_equal(statistics['median'], np.median(rows, axis=0))
+    assert np.allclose(statistics['std'], np.std(rows, axis=0), rtol=1e-12, atol=0)
+    assert np.allclose(statistics['trimmed_mean'], trim_mean(rows, 0.1), rtol=1e-12, atol=0)
+
+
+def test_range_statistics_of_an_empty_cell_are_nan():
+    rows = np.full((8, 3), 100.0)
+    rows[2, 1] = np.nan
+    for name, values in ExcelFilter.calculate_range_statistics(rows).items():
+        assert np.isnan(values).tolist() == [False, True, False], name
+
+
+def test_median_ignores_one_outlier_frame():
+    values = np.full((40, 2), 100.0)
+    values[3, 1] = 1000.0
+    assert filtered(values).results.good.tolist() == [True, False]
+    assert filtered(values, statistic='median').results.good.tolist() == [True, True]
+
+def sheet_values(path):
+    book = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return {sheet.title: list(sheet.iter_rows(values_only=True)) for sheet in book.worksheets}
+    finally:
+        book.close()
+
+
+def output_values(path):
+    if os.path.isdir(path):
+        values = {}
+        for name in sorted(os.listdir(path)):
+            with open(os.path.join(path, name), newline='') as fp:
+                values[name] = list(csv.reader(fp))
+        return values
+    return sheet_values(path)
+
+
+@pytest.mark.parametrize('output_format', ['xlsx', 'csv'])
+def test_incremental_append_matches_full_run(tmp_path, output_format):
+    recording = str(tmp_path / 'recording.xlsx')
+    generate_workbook(recording, 40, 12)
+    first = ExcelFilter(incremental=True, output_format=output_format)
+    first.process_excel_file(recording, 10, [2, 10], [20, 30], False, False)
+    # SAME SEED: THE LONGER RECORDING STARTS WITH THE SAME 40 ROWS
+    generate_workbook(recording, 60, 12)
+    appended = ExcelFilter(incremental=True, output_format=output_format)
+    appended.process_excel_file(recording, 10, [2, 10], [20, 30], False, False)
+    assert appended.excel_output_file == first.excel_output_file
+    full_recording = str(tmp_path / 'full.xlsx')
+    generate_workbook(full_recording, 60, 12)
+    full = ExcelFilter(output_format=output_format)
+    full.process_excel_file(full_recording, 10, [2, 10], [20, 30], False, False)
+    assert output_values(appended.excel_output_file) == output_values(full.excel_output_file)
+
+
+def write_parquet(path, workbook):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    rows = sheet_values(workbook)['Data']
+    pyarrow.parquet.write_table(pyarrow.table({title: [row[number] for row in rows[1:]]
+                                               for number, title in enumerate(rows[0])}), path)
+
+
+def test_incremental_append_parquet_input(tmp_path):
+    recording = str(tmp_path / 'recording.parquet')
+    generate_workbook(str(tmp_path / 'short.xlsx'), 40, 12)
+    write_parquet(recording, str(tmp_path / 'short.xlsx'))
+    first = ExcelFilter(incremental=True)
+    assert first.process_excel_file(recording, 10, [2, 10], [20, 30], False, False)[0]['error'] is None
+    assert os.path.exists(ExcelFilter.incremental_state_file(recording))
+    generate_workbook(str(tmp_path / 'long.xlsx'), 60, 12)
+    write_parquet(recording, str(tmp_path / 'long.xlsx'))
+    appended = ExcelFilter(incremental=True)
+    appended.process_excel_file(recording, 10, [2, 10], [20, 30], False, False)
+    assert appended.excel_output_file == first.excel_output_file
+    full_recording = str(tmp_path / 'full' / 'recording.parquet')
+    os.makedirs(os.path.dirname(full_recording))
+    write_parquet(full_recording, str(tmp_path / 'long.xlsx'))
+    full = ExcelFilter()
+    full.process_excel_file(full_recording, 10, [2, 10], [20, 30], False, False)
+    assert sheet_values(appended.excel_output_file) == sheet_values(full.excel_output_file)
+
+
+def test_single_file_result(workbook):
+    excel_filter = ExcelFilter()
+    results = excel_filter.process_excel_file(workbook, 10, [2, 10], [20, 30], False, False)
+    assert [result['error'] for result in results] == [None]
+    assert results[0]['good'] + results[0]['wrong'] == len(excel_filter.results) == 12
+    assert results[0]['results'] == excel_filter.results.to_dict()
+    assert sum(results[0]['results']['good']) == results[0]['good']
+
+
+def test_file_list_results(workbook, tmp_path):
+    file_list = tmp_path / 'files.txt'
+    file_list.write_text('{}\n{}\n'.format(workbook, tmp_path / 'missing.xlsx'))
+    results = ExcelFilter().process_excel_file(str(file_list), 10, [2, 10], [20, 30], False, False)
+    assert len(results[0]['results']['column']) == 12 and results[0]['error'] is None
+    assert results[1]['results'] is None and results[1]['error'] is not None
+
+
+def test_output_name_with_dots():
+    name = ExcelFilter.create_output_excel_file_name('./data.v2/in.run1.xlsx', 'threshold-10')
+    assert name.startswith('./data.v2/in.run1_threshold-10_') and name.endswith('.xlsx')
+
+
+@pytest.mark.parametrize('output_format', ['xlsx', 'csv'])
+def test_chunked_output_matches_in_memory(tmp_path, workbook, output_format):
+    outputs = []
+    for chunk_rows in (None, 7):
+        recording = str(tmp_path / 'chunks-{}'.format(chunk_rows) / 'recording.xlsx')
+        os.makedirs(os.path.dirname(recording))
+        shutil.copy(workbook, recording)
+        excel_filter = ExcelFilter(output_format=output_format, chunk_rows=chunk_rows)
+        excel_filter.process_excel_file(recording, 10, [2, 10], [20, 30], False, False)
+        outputs.append(output_values(excel_filter.excel_output_file))
+    assert outputs[0] == outputs[1]
+
+
+def test_sweep_summary(tmp_path, workbook):
+    thresholds = [0, 5, 10, 100]
+    summary = ExcelFilter().sweep_thresholds(workbook, thresholds, [2, 10], [20, 30], False, False, [10])
+    sweep_values = sheet_values(glob.glob(str(tmp_path / 'recording_threshold-sweep_*.xlsx'))[0])
+    membership = sweep_values['good ROI by threshold']
+    assert list(membership[0]) == ['ROI'] + thresholds
+    for number, threshold in enumerate(thresholds):
+        # EACH THRESHOLD AGAINST A RUN OF ITS OWN, IN ITS OWN DIRECTORY (OUTPUT NAMES HOLD THE TIME TO THE SECOND)
+        recording = str(tmp_path / 'threshold-{}'.format(threshold) / 'recording.xlsx')
+        os.makedirs(os.path.dirname(recording))
+        shutil.copy(workbook, recording)
+        single = ExcelFilter()
+        single.process_excel_file(recording, threshold, [2, 10], [20, 30], False, False)
+        assert (summary[number]['good'], summary[number]['wrong']) == (single.good_count, single.wrong_count)
+        assert sweep_values['threshold sweep'][number + 1][:3] == (threshold, single.good_count, single.wrong_count)
+        assert [row[0] for row in membership[1:]] == list(single.results.title)
+        assert [row[number + 1] for row in membership[1:]] == single.results.good.astype(int).tolist()
+    # ONLY THE SELECTED THRESHOLD HAS ITS WORKBOOK
+    assert [result['output'] is not None for result in summary] == [False, False, True, False]
@@ -0,0 +1,33 @@
+import numpy as np
+
+import parallel
+
+from excel_filter import Constant, ExcelFilter
+
+
+def run(workbook, tmp_path, monkeypatch, **options):
+    monkeypatch.setattr(Constant, 'PARALLEL_MIN_COLUMNS', 0)
+    excel_filter = ExcelFilter(streaming=True, **options)
+    excel_filter.set_parameters(10, [2, 10], [20, 30], False, False)
+    monkeypatch.setattr(excel_filter, 'prepare_output_files',
+                        lambda file: setattr(excel_filter, 'excel_output_file', str(tmp_path / 'out.xlsx')))
+    excel_filter.main(workbook)
+    return excel_filter
+
+
+def test_same_results_as_one_core(workbook, tmp_path, monkeypatch):
+    serial = run(workbook, tmp_path, monkeypatch)
+    shared = run(workbook, tmp_path, monkeypatch, score_workers=3)
+    assert serial.sheets.keys() == shared.sheets.keys()
+    for title, sheet in serial.sheets.items():
+        if hasattr(sheet, 'values'):
+            assert np.array_equal(sheet.values, shared.sheets[title].values, equal_nan=True), title
+    assert np.array_equal(serial.results.difference, shared.results.difference)
+    assert np.array_equal(serial.results.column_mean, shared.results.column_mean)
+
+
+def test_chunked_mode_stays_on_one_core(workbook, tmp_path, monkeypatch):
+    def no_scorer(workers):
+        raise AssertionError('column scorer started in chunked mode')
+    monkeypatch.setattr(parallel, 'ColumnScorer', no_scorer)
+    run(workbook, tmp_path, monkeypatch, score_workers=2, chunk_rows=7)
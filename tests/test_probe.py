@@ -0,0 +1,40 @@
+import openpyxl
+
+from probe import validate_workbook
+
+
+def edited(workbook, tmp_path, edit):
+    book = openpyxl.load_workbook(workbook)
+    edit(book.active)
+    path = str(tmp_path / 'edited.xlsx')
+    book.save(path)
+    return path
+
+
+def test_valid_workbook(workbook):
+    assert validate_workbook(workbook, [2, 10], [20, 30], [22, 41]) == []
+
+
+def test_range_past_the_last_row(workbook):
+    errors = validate_workbook(workbook, [2, 10], [20, 30], [22, 45])
+    assert errors == ["Mean range error: [22, 45] goes past the last row of sheet 'Data' (row 41)"]
+
+
+def test_empty_cell_in_filter_range(workbook, tmp_path):
+    # READ AS NaN, ITS COLUMN IS CLASSIFIED WRONG AS FOR A CSV OR PARQUET INPUT
+    path = edited(workbook, tmp_path, lambda sheet: setattr(sheet['D5'], 'value', None))
+    assert validate_workbook(path, [2, 10], [20, 30], [22, 41]) == []
+
+
+def test_missing_row(workbook, tmp_path):
+    def delete_row(sheet):
+        for cell in sheet[25]:
+            cell.value = None
+    path = edited(workbook, tmp_path, delete_row)
+    assert validate_workbook(path, [2, 10], [20, 30], [22, 41]) == ["Row 25 of sheet 'Data' is missing or empty"]
+    assert validate_workbook(path, [2, 10], [20, 24], [22, 41], skip_normalization=True) == []
+
+
+def test_text_cell(workbook, tmp_path):
+    path = edited(workbook, tmp_path, lambda sheet: setattr(sheet['E7'], 'value', 'n/a'))
+    assert validate_workbook(path, [2, 10], [20, 30]) == ["Cell E7 of sheet 'Data' is not a number"]
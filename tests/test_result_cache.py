@@ -0,0 +1,61 @@
+import os
+import shutil
+
+import numpy as np
+import openpyxl
+
+from excel_filter import ExcelFilter
+from result_cache import ResultCache
+
+
+def test_miss_then_hit(tmp_path, workbook):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    key = cache.key(workbook, [[2, 10], [20, 30]])
+    assert cache.load(key) is None
+    cache.store(key, {'values': np.arange(6.0).reshape(2, 3)}, {'title': 'Data'})
+    arrays, metadata = cache.load(key)
+    assert np.array_equal(arrays['values'], np.arange(6.0).reshape(2, 3)) and metadata == {'title': 'Data'}
+    # OTHER PARAMETERS, OTHER ENTRY
+    assert cache.load(cache.key(workbook, [[2, 10], [20, 31]])) is None
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes=2500)
+    values = {'values': np.zeros(100)}
+    for number, key in enumerate(('first', 'second')):
+        cache.store(key, values, {})
+        os.utime(os.path.join(cache.directory, key), (number, number))
+    # A HIT MAKES first THE MOST RECENTLY USED, THE THIRD ENTRY GOES PAST max_bytes AND second IS EVICTED
+    assert cache.load('first') is not None
+    cache.store('third', values, {})
+    assert sorted(os.listdir(cache.directory)) == ['first', 'third']
+
+
+def test_hit_skips_the_full_load(tmp_path, workbook, monkeypatch):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    first = ExcelFilter(cache=cache)
+    first.process_excel_file(workbook, 10, [2, 10], [20, 30], False, False)
+    load_workbook = openpyxl.load_workbook
+
+    def read_only_load(*arguments, **keywords):
+        assert keywords.get('read_only'), 'full load on a cache hit'
+        return load_workbook(*arguments, **keywords)
+    monkeypatch.setattr(openpyxl, 'load_workbook', read_only_load)
+    second = ExcelFilter(cache=cache)
+    second.process_excel_file(workbook, 12, [2, 10], [20, 30], False, False)
+    monkeypatch.undo()
+    uncached_copy = str(tmp_path / 'uncached' / 'recording.xlsx')
+    os.makedirs(os.path.dirname(uncached_copy))
+    shutil.copy(workbook, uncached_copy)
+    uncached = ExcelFilter()
+    uncached.process_excel_file(uncached_copy, 12, [2, 10], [20, 30], False, False)
+    assert second.results.to_dict() == uncached.results.to_dict()
+    assert sheet_values(second.excel_output_file) == sheet_values(uncached.excel_output_file)
+
+
+def sheet_values(path):
+    book = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return {sheet.title: list(sheet.iter_rows(values_only=True)) for sheet in book.worksheets}
+    finally:
+        book.close()
@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+from server import JobServer
+
+
+def job_server(max_queue=4):
+    # WHAT serve SETS UP BEFORE LISTENING, WITHOUT THE SOCKET
+    server = JobServer(workers=1, max_queue=max_queue)
+    server.queue = asyncio.Queue(max_queue)
+    return server
+
+
+def job_request(workbook, **options):
+    return json.dumps(dict({'file': workbook, 'threshold': 10, 'first_range': [2, 10], 'second_range': [20, 30]},
+                           **options)).encode()
+
+
+def test_bad_requests(workbook):
+    server = job_server()
+    assert server.route('POST', '/jobs', b'{not json')[0] == 400
+    status, content = server.route('POST', '/jobs', json.dumps({'file': workbook}).encode())
+    assert status == 400 and content['errors'] == ['missing: threshold, first_range, second_range']
+    status, content = server.route('POST', '/jobs', job_request(workbook, chunk_rows=True))
+    assert status == 400 and content['errors'] == ['chunk_rows should be a positive number of rows']
+    assert server.route('POST', '/jobs', job_request(workbook, first_range=[10, 2]))[0] == 400
+    assert server.jobs == {} and server.counters['submitted'] == 0
+
+
+def test_full_queue(workbook):
+    server = job_server(max_queue=1)
+    assert server.route('POST', '/jobs', job_request(workbook))[0] == 202
+    status, content = server.route('POST', '/jobs', job_request(workbook))
+    assert status == 503 and server.counters['rejected'] == 1 and len(server.jobs) == 1
+
+
+def test_cancel(workbook):
+    server = job_server()
+    assert server.route('DELETE', '/jobs/unknown', b'')[0] == 404
+    _, job = server.route('POST', '/jobs', job_request(workbook))
+    status, content = server.route('DELETE', '/jobs/{}'.format(job['id']), b'')
+    assert status == 200 and content['status'] == 'cancelled'
+    assert server.route('DELETE', '/jobs/{}'.format(job['id']), b'')[0] == 409
+
+
+def test_job_done(workbook):
+    async def run_job():
+        server = job_server()
+        server.executor = server.start_executor()
+        runner = asyncio.ensure_future(server.run_jobs())
+        try:
+            _, job = server.route('POST', '/jobs', job_request(workbook))
+            for _ in range(600):
+                status, job = server.route('GET', '/jobs/{}'.format(job['id']), b'')
+                if job['status'] in ('done', 'failed'):
+                    break
+                await asyncio.sleep(0.05)
+            return job, server.stats()
+        finally:
+            runner.cancel()
+            server.executor.shutdown()
+    job, stats = asyncio.run(run_job())
+    assert job['status'] == 'done', job['result']
+    assert job['result']['good'] + job['result']['wrong'] == len(job['result']['results']['column']) == 12
+    assert stats['done'] == 1 and stats['queued'] == stats['running'] == 0
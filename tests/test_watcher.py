@@ -0,0 +1,75 @@
+import os
+import shutil
+import time
+
+import watcher
+from excel_filter import ExcelFilter, process_batch_entry
+
+
+class StopWhen:
+    # stop_event OF FolderWatcher.run THAT IS SET ONCE condition() IS TRUE, OR AFTER timeout SECONDS
+    def __init__(self, condition, timeout=60):
+        self.condition = condition
+        self.deadline = time.monotonic() + timeout
+
+    def is_set(self):
+        return self.condition() or time.monotonic() > self.deadline
+
+    def wait(self, seconds):
+        time.sleep(seconds)
+
+
+def folder_watcher(directory, workers=1):
+    excel_filter = ExcelFilter()
+    excel_filter.set_parameters(10, [2, 10], [20, 30], False, False)
+    return watcher.FolderWatcher(str(directory), excel_filter.batch_parameters(), workers, poll_seconds=0.05)
+
+
+def test_file_is_queued_once_settled(tmp_path):
+    recording = tmp_path / 'recording.csv'
+    recording.write_text('Time,Background,ROI1\n')
+    folder = folder_watcher(tmp_path)
+    folder.scan()
+    assert list(folder.queue) == [] and str(recording) in folder.unsettled
+    # STILL BEING WRITTEN: THE SIZE CHANGED SINCE THE LAST POLL
+    recording.write_text('Time,Background,ROI1\n1,100,500\n')
+    folder.scan()
+    assert list(folder.queue) == []
+    folder.scan()
+    assert list(folder.queue) == [str(recording)]
+    # SAME SIGNATURE, NOT QUEUED AGAIN
+    folder.scan()
+    assert list(folder.queue) == [str(recording)] and folder.counters['detected'] == 1
+
+
+def test_output_files_are_not_inputs():
+    output = ExcelFilter.create_output_excel_file_name('recording.xlsx', 'threshold-10')
+    assert not watcher.FolderWatcher.is_input_file(os.path.basename(output))
+    assert watcher.FolderWatcher.is_input_file('recording.xlsx')
+    assert not watcher.FolderWatcher.is_input_file('~$recording.xlsx')
+    assert not watcher.FolderWatcher.is_input_file('notes.txt')
+
+
+def test_processed_file_is_skipped_after_a_restart(tmp_path, workbook):
+    folder = folder_watcher(tmp_path)
+    stats = folder.run(StopWhen(lambda: folder.counters['processed'] + folder.counters['failed'] == 1))
+    assert stats['processed'] == 1 and stats['failed'] == 0
+    # SAME CONTENT UNDER ANOTHER NAME, SEEN BY A NEW WATCHER: THE LEDGER SKIPS IT
+    shutil.copy(workbook, str(tmp_path / 'copy.xlsx'))
+    restarted = folder_watcher(tmp_path)
+    stats = restarted.run(StopWhen(lambda: restarted.counters['skipped'] == 2))
+    assert stats['skipped'] == 2 and stats['processed'] == 0
+
+
+def crash_or_process(excel_file, parameters):
+    if 'crash' in os.path.basename(excel_file):
+        os._exit(1)
+    return process_batch_entry(excel_file, parameters)
+
+
+def test_worker_crash_fails_its_file_only(tmp_path, workbook, monkeypatch):
+    monkeypatch.setattr(watcher, 'process_batch_entry', crash_or_process)
+    (tmp_path / 'crash.csv').write_text('Time,Background,ROI1\n1,100,500\n')
+    folder = folder_watcher(tmp_path)
+    stats = folder.run(StopWhen(lambda: folder.counters['processed'] + folder.counters['failed'] == 2))
+    assert stats['processed'] == 1 and stats['failed'] == 1
@@ -0,0 +1,199 @@
+import collections
+import json
+import logging
+import os
+import re
+import signal
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from excel_filter import Constant, process_batch_entry
+from result_cache import content_key
+
+# OUTPUT FILES OF create_output_excel_file_name ARE WRITTEN IN THE WATCHED DIRECTORY, THEY MUST NOT BE PICKED UP
+OUTPUT_NAME = re.compile(r'_{}[^_]+_\d{{4}}(-\d{{2}}){{5}}$'.format(re.escape(Constant.THRESHOLD)))
+
+
+class FolderWatcher:
+    # HOT FOLDER: THE DIRECTORY IS POLLED EVERY poll_seconds, A NEW FILE IS QUEUED ONCE ITS SIZE AND MTIME DID NOT
+    # CHANGE BETWEEN TWO POLLS (THE MICROSCOPE FINISHED WRITING IT). AT MOST workers FILES RUN AT THE SAME TIME,
+    # THE OTHERS WAIT IN THE QUEUE. A FILE WHOSE CONTENT WAS ALREADY PROCESSED WITH THE SAME PARAMETERS (LEDGER OF
+    # CONTENT HASHES, ONE JSON LINE PER PROCESSED FILE) IS SKIPPED, ALSO ACROSS RESTARTS.
+
+    def __init__(self, directory, parameters, workers=1, poll_seconds=Constant.WATCH_POLL_SECONDS,
+                 ledger_file=None, stats_seconds=Constant.WATCH_STATS_SECONDS):
+        self.directory = directory
+        self.parameters = parameters
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.ledger_file = ledger_file or os.path.join(directory, Constant.WATCH_LEDGER)
+        self.stats_seconds = stats_seconds
+        self.ledger_key_parameters = self.key_parameters(parameters)
+        self.processed_keys = self.read_ledger()
+        # FILE -> (SIZE, MTIME): SIGNATURE AT THE LAST POLL WHILE IT MAY BE BEING WRITTEN, AND SIGNATURE WHEN IT WAS
+        # QUEUED, SO A FILE IS ONLY QUEUED AGAIN IF IT IS REWRITTEN
+        self.unsettled = {}
+        self.seen = {}
+        self.queue = collections.deque()
+        # FUTURE -> (FILE, LEDGER KEY, START TIME)
+        self.running = {}
+        self.pool_broken = False
+        self.started = None
+        self.counters = {'detected': 0, 'processed': 0, 'failed': 0, 'skipped': 0, 'busy_seconds': 0.0}
+
+    @staticmethod
+    def key_parameters(parameters):
+        # ONLY WHAT CHANGES THE OUTPUT: STREAMING, CHUNKS OR THE CACHE GIVE THE SAME RESULT
+        options, threshold, first_range, second_range, skip_background, skip_normalization, mean_range = parameters
+        return [threshold, first_range, second_range, skip_background, skip_normalization, mean_range,
+                options['output_format'], options['statistic']]
+
+    def read_ledger(self):
+        keys = set()
+        if os.path.isfile(self.ledger_file):
+            with open(self.ledger_file) as fp:
+                for line in fp:
+                    try:
+                        keys.add(json.loads(line)['key'])
+                    except (ValueError, KeyError):
+                        logging.warning("ignoring a bad ledger line in '{}'...".format(self.ledger_file))
+        return keys
+
+    def write_ledger(self, key, result):
+        entry = {'key': key, 'file': result['file'], 'output': result['output'], 'seconds': result['seconds'],
+                 'finished': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        with open(self.ledger_file, 'a') as fp:
+            fp.write(json.dumps(entry) + '\n')
+        self.processed_keys.add(key)
+
+    def run(self, stop_event=None):
+        logging.info("watching '{}' every {} s with {} worker(s)...".format(self.directory, self.poll_seconds,
+                                                                             self.workers))
+        self.started = time.monotonic()
+        next_stats = self.started + self.stats_seconds
+        executor = self.start_executor()
+        try:
+            while stop_event is None or not stop_event.is_set():
+                self.scan()
+                self.submit(executor)
+                if self.running:
+                    done, _ = wait(self.running, timeout=self.poll_seconds, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self.finish(future)
+                    if self.pool_broken:
+                        executor = self.restart_executor(executor)
+                elif stop_event is not None:
+                    stop_event.wait(self.poll_seconds)
+                else:
+                    time.sleep(self.poll_seconds)
+                if time.monotonic() >= next_stats:
+                    self.log_stats()
+                    next_stats = time.monotonic() + self.stats_seconds
+        except KeyboardInterrupt:
+            logging.info("stopping the watcher...")
+        finally:
+            # FILES ALREADY RUNNING ARE FINISHED, QUEUED ONES ARE PICKED UP AGAIN ON THE NEXT START
+            executor.shutdown(cancel_futures=True)
+            for future in list(self.running):
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    self.finish(future)
+            self.log_stats()
+        return self.stats()
+
+    def start_executor(self):
+        self.pool_broken = False
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=ignore_interrupt)
+
+    def restart_executor(self, executor):
+        # ALL THE FILES OF A BROKEN POOL FAIL, THE QUEUED ONES GO TO A NEW POOL
+        logging.warning("a worker died, starting a new pool...")
+        executor.shutdown(cancel_futures=True)
+        for future in [future for future in self.running if future.done()]:
+            self.finish(future)
+        return self.start_executor()
+
+    def scan(self):
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError as e:
+            logging.error("cannot list '{}': {}".format(self.directory, e))
+            return
+        for entry in entries:
+            if not entry.is_file() or not self.is_input_file(entry.name):
+                continue
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self.seen.get(entry.path) == signature:
+                continue
+            if self.unsettled.get(entry.path) != signature:
+                # NEW OR STILL BEING WRITTEN, LOOKED AT AGAIN ON THE NEXT POLL
+                self.unsettled[entry.path] = signature
+                continue
+            del self.unsettled[entry.path]
+            self.seen[entry.path] = signature
+            self.counters['detected'] += 1
+            self.queue.append(entry.path)
+
+    @staticmethod
+    def is_input_file(name):
+        stem, extension = os.path.splitext(name)
+        if name.startswith(('.', '~$')) or extension.lower() not in Constant.EXCEL_EXTENSIONS + \
+                Constant.DATA_EXTENSIONS:
+            return False
+        return OUTPUT_NAME.search(stem) is None
+
+    def submit(self, executor):
+        while self.queue and len(self.running) < self.workers:
+            excel_file = self.queue.popleft()
+            try:
+                key = content_key(excel_file, self.ledger_key_parameters)
+            except OSError as e:
+                logging.error("{}: {}".format(excel_file, e))
+                self.counters['failed'] += 1
+                continue
+            if key in self.processed_keys or key in [key for _, key, _ in self.running.values()]:
+                logging.info("'{}' already processed with these parameters, skipping...".format(excel_file))
+                self.counters['skipped'] += 1
+                continue
+            logging.info("processing '{}'...".format(excel_file))
+            self.running[executor.submit(process_batch_entry, excel_file, self.parameters)] = \
+                (excel_file, key, time.monotonic())
+
+    def finish(self, future):
+        excel_file, key, started = self.running.pop(future)
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            # A WORKER THAT DIED (KILLED, OUT OF MEMORY) FAILS ITS FILE, NOT THE WATCHER, run STARTS A NEW POOL
+            self.pool_broken = True
+            result = {'file': excel_file, 'seconds': time.monotonic() - started, 'good': 0, 'wrong': 0,
+                      'output': None, 'error': str(e) or type(e).__name__, 'results': None}
+        self.counters['busy_seconds'] += result['seconds']
+        if result['error'] is None:
+            self.counters['processed'] += 1
+            self.write_ledger(key, result)
+            logging.info("{file}: {seconds:.2f} s, {good} good, {wrong} wrong -> '{output}'".format(**result))
+        else:
+            # NOT IN THE LEDGER: THE FILE IS TRIED AGAIN IF IT IS REWRITTEN OR ON THE NEXT START
+            self.counters['failed'] += 1
+            logging.error("{file}: {seconds:.2f} s, FAILED: {error}".format(**result))
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+        finished = self.counters['processed'] + self.counters['failed']
+        return dict(self.counters, queued=len(self.queue), running=len(self.running), unsettled=len(self.unsettled),
+                    elapsed_seconds=elapsed,
+                    files_per_minute=60.0 * self.counters['processed'] / elapsed if elapsed else 0.0,
+                    mean_seconds=self.counters['busy_seconds'] / finished if finished else 0.0)
+
+    def log_stats(self):
+        logging.info("watch: {queued} queued, {running} running, {processed} processed, {failed} failed, "
+                     "{skipped} skipped, {files_per_minute:.2f} files/min, {mean_seconds:.2f} s/file".format(
+                         **self.stats()))
+
+
+def ignore_interrupt():
+    # CTRL+C STOPS THE WATCHER ONLY, THE WORKERS FINISH THE FILE THEY ARE PROCESSING
+    signal.signal(signal.SIGINT, signal.SIG_IGN)